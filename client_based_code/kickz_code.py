@@ -1,11 +1,28 @@
+import io
+import os
+import json
+import hashlib
+import threading
 import logging
 import pyodbc
 import pandas as pd
 import datetime as dt
 import numpy as np
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+from concurrent.futures import ThreadPoolExecutor
 
-from libs.s3 import S3
+from botocore.exceptions import ClientError
+
+from libs.s3 import S3, S3DiskCache
 from libs.bq import BigQuery 
+from libs.help_functions import COUNTRY_CODE_CURRENCY_MAPPER, safe_literal_eval
+from libs.sql_server import ConnectionPool, read_sql_columnar, integer_column
+from libs.query_cache import QueryCache, cached
+from libs.parquet_archive import DailyParquetArchive
+from libs.utils import retry
 
 logger = logging.getLogger(__name__)
 
@@ -20,28 +37,96 @@ CONNECTION_STRING = """
     Connection Timeout=30')
 """
 
-def load_material_number_mapper():
-    SQL = """
-        SELECT   
-            DISTINCT
-            LOWER(TRIM(brand)) AS brand,
-            LOWER(TRIM(style_id)) AS style,
-            TRIM(material_number) AS material_number
-        FROM [rawone11].[v_pim_articles_data]
-        WHERE item_shop_active_kickz = 1
-            AND name IS NOT NULL
-            AND style_id IS NOT NULL
-            AND brand IS NOT NULL;
+# spolocne spojenia pre vsetky loadery (aj paralelne bezace)
+POOL = ConnectionPool(CONNECTION_STRING, max_size=4)
+
+# vysledky loaderov zdielane medzi cron jobmi (KICKZ_QUERY_CACHE=0 => vypnute)
+CACHE = QueryCache(
+    './cache/queries', 
+    max_bytes = 2 * 2**30, 
+    enabled = os.environ.get('KICKZ_QUERY_CACHE', '1') != '0'
+)
+HOUR = 60 * 60
+
+# lokalna kopia S3 objektov (revalidovana cez ETag), len na poziadanie: KICKZ_S3_CACHE=1
+if os.environ.get('KICKZ_S3_CACHE', '0') == '1':
+    S3.enable_cache('./cache/s3', max_bytes=5 * 2**30)
+
+def _upload_styles(cursor, styles):
+    """
+    Uploads styles into session temp table #styles (column `style`),
+    so queries can filter styles on the server by joining it.
+    """
+    cursor.execute("""
+        IF OBJECT_ID('tempdb..#styles') IS NOT NULL DROP TABLE #styles;
+        CREATE TABLE #styles (style NVARCHAR(255) COLLATE DATABASE_DEFAULT PRIMARY KEY);
+    """)
+    cursor.fast_executemany = True
+    cursor.executemany('INSERT INTO #styles (style) VALUES (?)', [(style,) for style in set(styles)])
+
+def _styles_filter(styles, column):
     """
-    with pyodbc.connect(CONNECTION_STRING) as con:
-        df = pd.read_sql(SQL,con)
+    Returns JOIN clause which keeps only rows where `column` is in #styles.
+    Empty string when styles are not provided.
+    """
+    if not styles:
+        return ''
+
+    return f'INNER JOIN #styles AS filter_styles ON filter_styles.style = {column}'
+
+@retry(pyodbc.OperationalError, total_tries=3, initial_wait=5, logger=logger)
+def _read_sql(SQL, schema, styles=None, name=None):
+    """
+    Executes query on a pooled connection and returns DataFrame typed by `schema` 
+    (see `read_sql_columnar`). If styles are provided, they are uploaded into 
+    #styles temp table first (see `_styles_filter`).
     
-    if df.empty:
-        logger.info('Table is empty!!!')
-        
+    Connection broken during the query is dropped from the pool and the query
+    is retried on a new one.
+    """
+    with POOL.connection() as con:
+        if styles:
+            _upload_styles(con.cursor(), styles)
+
+        df = read_sql_columnar(con, SQL, schema, name=name)
+
     return df
 
-def load_competitors_data(credentials, from_date, to_date, threshold):
+def _probe(SQL, name):
+    """
+    Runs cheap query returning one row and returns it as fingerprint string
+    (used by the query cache to detect whether the source changed)
+    """
+    df = _read_sql(SQL, {}, name=name)
+    return json.dumps(df.to_dict('records'), default=str)
+
+def _probe_inventory():
+    return _probe(
+        """
+        SELECT 
+            MAX(balance_date) AS max_balance_date,
+            COUNT_BIG(*) AS rows_count
+        FROM [raw11ts].[sage_stock_balance_history_per_style]
+        WHERE balance_date = (
+            SELECT MAX(balance_date) 
+            FROM [raw11ts].[sage_stock_balance_history_per_style]
+        )
+        """,
+        name='probe inventory'
+    )
+
+def _probe_prices():
+    return _probe(
+        """
+        SELECT 
+            COUNT_BIG(*) AS rows_count,
+            CHECKSUM_AGG(BINARY_CHECKSUM(style, country, currency, sale_price, rrp)) AS checksum
+        FROM [rawKickz].[product_sales_price]
+        """,
+        name='probe prices'
+    )
+
+def load_competitors_data(credentials, from_date, to_date, threshold, use_bqstorage=True):
     """
     Load competitor pricing data from BigQuery within a given date range 
     and filtered by a matching threshold.
@@ -56,9 +141,12 @@ def load_competitors_data(credentials, from_date, to_date, threshold):
         threshold (float): Minimum similarity threshold; only rows where 
             at least one of the matching fields exceeds this value are 
             included.
+        use_bqstorage (bool): Download the result through the BigQuery 
+            Storage Read API (Arrow) instead of REST JSON pages, REST is 
+            used if google-cloud-bigquery-storage is not available.
 
     Returns:
-        pandas.DataFrame
+        pandas.DataFrame, country_code and competitor_shop_name are categoricals
     """
     bq = BigQuery.from_json_credentials(credentials)
     
@@ -86,48 +174,104 @@ def load_competitors_data(credentials, from_date, to_date, threshold):
         (date BETWEEN '{from_date}' AND '{to_date}')
      """
     
-    df = bq.get_data_from_query(SQL)
+    df = bq.get_data_from_query(
+        SQL,
+        use_bqstorage=use_bqstorage,
+        dtypes={'country_code': 'category', 'competitor_shop_name': 'category'}
+    )
     
     if df.empty:
         logger.info('Table is empty!!!')
         
     return df.dropna()
 
-def get_all_products() -> pd.DataFrame:
+def load_latest_competitors_data(credentials, from_date, to_date, threshold, exclude_shops=('kickz',), use_bqstorage=True):
     """
-    Retrieve all products from the database for Kickz.
+    Same as `load_competitors_data`, but only the latest row per url is returned 
+    and the processing is done in BigQuery:
+        - rows with missing values are dropped
+        - missing currency is filled by the currency of the country 
+          (COUNTRY_CODE_CURRENCY_MAPPER)
+        - rows of our own shops (shop name in url or seller) are excluded
 
-    Returns
-    -------
-    pandas.DataFrame
-        A DataFrame with the following columns:
-        - brand (str): The product brand, in lowercase.
-        - product_name (str): The cleaned product name.
-        - style (str): The generic material number (style), in lowercase.
+    Args:
+        credentials (dict or str): JSON service account credentials used 
+            to authenticate with BigQuery.
+        from_date (str): Start date (inclusive) of the query in format 
+            'YYYY-MM-DD'.
+        to_date (str): End date (inclusive) of the query in format 
+            'YYYY-MM-DD'.
+        threshold (float): Minimum similarity threshold; only rows where 
+            at least one of the matching fields exceeds this value are 
+            included.
+        exclude_shops (tuple[str]): Lowercase names of our shops.
+        use_bqstorage (bool): Download the result through the BigQuery 
+            Storage Read API (Arrow) instead of REST JSON pages, REST is 
+            used if google-cloud-bigquery-storage is not available.
+
+    Returns:
+        pandas.DataFrame, country_code and competitor_shop_name are categoricals
     """
+    bq = BigQuery.from_json_credentials(credentials)
     
-    SQL = """
-        SELECT
-            DISTINCT
-                LOWER(TRIM(brand)) AS brand,
-                LTRIM(RTRIM(LOWER(TRIM(brand)) + ' ' + REPLACE(LOWER(TRIM(name)), LOWER(TRIM(brand)), ''))) AS product_name,
-                LOWER(TRIM(style_id)) AS style
-        FROM [rawone11].[v_pim_articles_data]
-        WHERE item_shop_active_kickz = 1
-        AND name IS NOT NULL
-        AND style_id IS NOT NULL
-        AND brand IS NOT NULL;
-    """
-
-    with pyodbc.connect(CONNECTION_STRING) as con:
-        df = pd.read_sql(SQL,con)
+    currency_fallback = ' '.join(
+        f"WHEN '{country_code}' THEN '{currency}'" 
+        for country_code, currency in COUNTRY_CODE_CURRENCY_MAPPER.items()
+    )
+    our_shops = ' OR '.join(
+        f"STRPOS(link, '{shop}') > 0 OR STRPOS(LOWER(seller), '{shop}') > 0" 
+        for shop in exclude_shops
+    )
+    
+    SQL = f"""
+        SELECT 
+            date,
+            UPPER(country_code) AS country_code,
+            brand,
+            style,
+            COALESCE(
+                NULLIF(UPPER(currency), ''), 
+                CASE UPPER(country_code) {currency_fallback} END
+            ) AS currency,
+            price,
+            LOWER(seller) AS competitor_shop_name,
+            link AS url
+        FROM dbt_eas_kickz_scraping.reporting_competitor_prices
+        WHERE 
+        (
+            (query_inside_link > {threshold}) OR
+            (product_name_inside_link > {threshold}) OR
+            (style_inside_link > {threshold}) OR
+            (query_inside_title > {threshold}) OR
+            (product_name_inside_title > {threshold}) OR
+            (style_inside_title > {threshold})
+        )
+        AND 
+        (date BETWEEN '{from_date}' AND '{to_date}')
+        AND date IS NOT NULL
+        AND country_code IS NOT NULL
+        AND brand IS NOT NULL
+        AND style IS NOT NULL
+        AND currency IS NOT NULL
+        AND price IS NOT NULL
+        AND seller IS NOT NULL
+        AND link IS NOT NULL
+        AND NOT ({our_shops or 'FALSE'})
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY link ORDER BY date DESC) = 1
+     """
+    
+    df = bq.get_data_from_query(
+        SQL,
+        use_bqstorage=use_bqstorage,
+        dtypes={'country_code': 'category', 'competitor_shop_name': 'category'}
+    )
     
     if df.empty:
         logger.info('Table is empty!!!')
         
-    return df
+    return df.dropna()
 
-def get_quantities_from_inventory(styles=None, as_dict=False, nth_latest=1) -> pd.DataFrame:
+def get_quantities_from_inventory(styles=None, as_dict=False, nth_latest=1, use_cache=True) -> pd.DataFrame:
     """
     Retrieve product quantities from inventory for a given balance date snapshot.
 
@@ -143,7 +287,18 @@ def get_quantities_from_inventory(styles=None, as_dict=False, nth_latest=1) -> p
         - 1 = latest snapshot
         - 2 = second latest snapshot
         - N = N-th latest snapshot
+    use_cache : bool, default True
+        If False, the query result cache is bypassed.
     """
+    df = _load_quantities_from_inventory(styles, nth_latest, use_cache=use_cache)
+    
+    if as_dict:
+        return df.set_index(['brand','style']).to_dict().get('available_quantity')
+    
+    return df
+
+@cached(CACHE, ttl=HOUR, unordered=('styles',), probe=_probe_inventory)
+def _load_quantities_from_inventory(styles, nth_latest):
     SQL = f"""
         WITH date_ranked AS (
             SELECT DISTINCT
@@ -165,6 +320,7 @@ def get_quantities_from_inventory(styles=None, as_dict=False, nth_latest=1) -> p
             ON war.warehouse_id = sto.warehouse_id
         LEFT JOIN product.one11_styles AS sty
             ON sty.id_style = sto.id_style
+        {_styles_filter(styles, 'LOWER(TRIM(sty.style_id))')}
         WHERE war.entity_id = 1
           AND war.exclude = 0
           AND sto.balance_date = (
@@ -177,50 +333,123 @@ def get_quantities_from_inventory(styles=None, as_dict=False, nth_latest=1) -> p
             sty.brand,
             sty.style_id;
     """
-    with pyodbc.connect(CONNECTION_STRING) as c:
-        df = pd.read_sql(SQL,c)
-    
-    if styles:
-        df = df[df['style'].isin(styles)]
+    SCHEMA = {'brand': 'str', 'style': 'str', 'available_quantity': 'int32'}
+    df = _read_sql(SQL, SCHEMA, styles, name='get_quantities_from_inventory')
     
     if df.empty:
         logger.info('Table is empty!!!')
     
-    if as_dict:
-        return df.set_index(['brand','style']).to_dict().get('available_quantity')
-    
     return df
 
-def get_live_styles() -> list:
+def get_inventory_snapshots(snapshots=(1,), styles=None, use_cache=True) -> pd.DataFrame:
     """
-    Retrieve all active style codes
+    Retrieve product quantities from several inventory balance snapshots in one query.
+
+    Parameters
+    ----------
+    snapshots : list of int | datetime.date
+        Requested snapshots:
+        - int N = N-th latest balance date (1 = latest)
+        - datetime.date = latest balance date on or before this date
+    styles : list of str, optional
+        If provided, filter the result to include only these style identifiers.
+    use_cache : bool, default True
+        If False, the query result cache is bypassed.
 
     Returns
     -------
-    set of str
-        Unique lowercase style codes.
+    pandas.DataFrame
+        Wide table indexed by (brand, style) with one column of available quantity 
+        per requested snapshot (columns are the `snapshots` values, NaN = style 
+        not in that snapshot).
     """
-    SQL = """
+    snapshots = list(snapshots)
+    df = _load_inventory_snapshots(styles, snapshots, use_cache=use_cache)
+    
+    df_wide = df.set_index(['brand','style','snapshot'])['available_quantity']\
+                .unstack('snapshot')\
+                .reindex(columns=range(len(snapshots)))
+    df_wide.columns = snapshots
+    
+    return df_wide
+
+@cached(CACHE, ttl=HOUR, unordered=('styles',), probe=_probe_inventory)
+def _load_inventory_snapshots(styles, snapshots):
+    requested = '\n            UNION ALL\n'.join(
+        f"""
+            SELECT {i} AS snapshot, balance_date 
+            FROM date_ranked 
+            WHERE date_rank = {snapshot}
+        """
+        if isinstance(snapshot, int) else
+        f"""
+            SELECT {i} AS snapshot, MAX(balance_date) AS balance_date 
+            FROM date_ranked 
+            WHERE balance_date <= '{snapshot}'
+        """
+        for i, snapshot in enumerate(snapshots)
+    )
+    
+    SQL = f"""
+        WITH date_ranked AS (
+            SELECT DISTINCT
+                sto.balance_date,
+                DENSE_RANK() OVER (ORDER BY sto.balance_date DESC) AS date_rank
+            FROM [raw11ts].[sage_stock_balance_history_per_style] AS sto
+            INNER JOIN [one11].[v_warehouses] AS war
+                ON war.warehouse_id = sto.warehouse_id
+            WHERE war.entity_id = 1
+              AND war.exclude = 0
+        ),
+        requested AS (
+            {requested}
+        )
         SELECT
-            DISTINCT LOWER(TRIM(COALESCE(pim.style_id,ccv.colorVariantCode))) AS style
-        FROM
-            [rawOne11].[sap_ccv2] AS ccv
-        LEFT JOIN
-            rawone11.v_pim_articles_data AS pim
-        ON
-            pim.str_ean=ccv.ean
-        WHERE
-            stock > 0
+            req.snapshot,
+            LOWER(TRIM(sty.brand)) AS brand,
+            LOWER(TRIM(sty.style_id)) AS style,
+            SUM(sto.quantity) AS available_quantity
+        FROM [raw11ts].[sage_stock_balance_history_per_style] AS sto
+        INNER JOIN requested AS req
+            ON req.balance_date = sto.balance_date
+        INNER JOIN [one11].[v_warehouses] AS war
+            ON war.warehouse_id = sto.warehouse_id
+        LEFT JOIN product.one11_styles AS sty
+            ON sty.id_style = sto.id_style
+        {_styles_filter(styles, 'LOWER(TRIM(sty.style_id))')}
+        WHERE war.entity_id = 1
+          AND war.exclude = 0
+        GROUP BY
+            req.snapshot,
+            sty.brand,
+            sty.style_id;
     """
-    with pyodbc.connect(CONNECTION_STRING) as con:
-        df = pd.read_sql(SQL,con)
-        
+    SCHEMA = {'snapshot': 'int32', 'brand': 'str', 'style': 'str', 'available_quantity': 'int32'}
+    df = _read_sql(SQL, SCHEMA, styles, name='get_inventory_snapshots')
+    
     if df.empty:
         logger.info('Table is empty!!!')
-        
-    return set(df['style'])
+    
+    return df
+
+DAILY_ORDERS_SCHEMA = {
+    'date': 'datetime64[ns]',
+    'style': 'category',
+    'country_code': 'category',
+    'quantity': 'int32',
+}
+
+def _daily_orders_dtypes(df):
+    """
+    Casts aggregated orders to compact types (see `get_orders(aggregated=True)`),
+    quantity with NULL or non-integral sums stays float64 (like in read_sql_columnar)
+    """
+    df = df.astype({column: dtype for column, dtype in DAILY_ORDERS_SCHEMA.items() if column != 'quantity'})
+    df['quantity'] = integer_column(df['quantity'].to_numpy(dtype=np.float64), DAILY_ORDERS_SCHEMA['quantity'], 'quantity')
+    return df
 
-def get_orders(styles = None, from_date=None, to_date=None) -> pd.DataFrame:
+@cached(CACHE, ttl=4 * HOUR, unordered=('styles',))
+def get_orders(styles = None, from_date=None, to_date=None, aggregated=False) -> pd.DataFrame:
     """
     Retrieve order data from database within a given date range.
     
@@ -230,6 +459,13 @@ def get_orders(styles = None, from_date=None, to_date=None) -> pd.DataFrame:
         Start date for filtering orders. Defaults to January 1, 2024 if not provided.
     to_date : datetime.date, optional
         End date for filtering orders. Defaults to today's date if not provided.
+    aggregated : bool, default False
+        If True, quantities are summed on SQL Server per style, country and day
+        and only these columns are returned:
+        - date (datetime64): Order creation day.
+        - style (category): Generic SAP material number.
+        - country_code (category): Country code of the buyer.
+        - quantity (int32, float64 if some sum is NULL): Ordered quantity in that day.
 
     Returns
     -------
@@ -248,6 +484,40 @@ def get_orders(styles = None, from_date=None, to_date=None) -> pd.DataFrame:
         from_date = dt.date(2024,1,1)
     if not to_date:
         to_date = dt.date.today() 
+    
+    if aggregated:
+        SQL = f"""
+            SELECT
+                CAST(hd.CreationDate AS date) AS date,
+                LOWER(TRIM(a.style_id)) AS style,
+                COALESCE(RIGHT(hd.SalesOffice, 2), 'NA') AS country_code,
+                SUM(o.OrderQuantity) AS quantity
+            FROM [raw11ts].[sap_order_headers] hd
+            INNER JOIN [raw11ts].[sap_orders] o 
+                ON hd.SalesOrder = o.SalesOrder
+            INNER JOIN [rawone11].[v_pim_articles_data] a
+                ON a.str_ean = o.InternationalArticleNumber
+            {_styles_filter(styles, 'LOWER(TRIM(a.style_id))')}
+            WHERE 
+                hd.SalesOrganization = '1300' -- Kickz
+                AND hd.DistributionChannel = '10' -- E-commer
+                AND a.name IS NOT NULL
+                AND a.style_id IS NOT NULL
+                AND a.brand IS NOT NULL
+                AND hd.CreationDate >= '{from_date}'
+                AND hd.CreationDate <= '{to_date}'
+            GROUP BY
+                CAST(hd.CreationDate AS date),
+                LOWER(TRIM(a.style_id)),
+                COALESCE(RIGHT(hd.SalesOffice, 2), 'NA');
+            """
+        
+        df = _read_sql(SQL, DAILY_ORDERS_SCHEMA, styles, name='get_orders (aggregated)')
+        
+        if df.empty:
+            logger.info('Table is empty!!!')
+        
+        return df
         
     SQL = f"""
         SELECT
@@ -263,6 +533,7 @@ def get_orders(styles = None, from_date=None, to_date=None) -> pd.DataFrame:
             ON hd.SalesOrder = o.SalesOrder
         INNER JOIN [rawone11].[v_pim_articles_data] a
             ON a.str_ean = o.InternationalArticleNumber
+        {_styles_filter(styles, 'LOWER(TRIM(a.style_id))')}
         LEFT JOIN dbo.conversion_rates_daily cr  
             ON  cr.RateDate = hd.CreationDate 
             AND cr.currency = hd.PaymentCurrency
@@ -276,17 +547,177 @@ def get_orders(styles = None, from_date=None, to_date=None) -> pd.DataFrame:
             AND hd.CreationDate <= '{to_date}';
         """
 
-    with pyodbc.connect(CONNECTION_STRING) as con:
-        df = pd.read_sql(SQL,con)
+    SCHEMA = {
+        'date': 'datetime64[ns]',
+        'quantity': 'int32',
+        'unit_price_vat_excl': 'float64',
+        'country_code': 'category',
+        'brand': 'str',
+        'product_name': 'str',
+        'style': 'str',
+    }
+    df = _read_sql(SQL, SCHEMA, styles, name='get_orders')
     
     if df.empty:
         logger.info('Table is empty!!!')
-        
-    if styles:
-        df = df[df['style'].isin(styles)]
-        
+
     return df
 
+class OrdersStore:
+    """
+    Local copy of orders partitioned by day (one Parquet file per order date).
+
+    Only the days after the high-water mark (plus RESYNC_DAYS before it, to catch
+    late changes of recent orders) are fetched from SQL Server, every date range
+    is then served from the local files.
+    """
+    PATH = './data/orders'
+    STATE_FILE = '_state.json'
+    DATE_FORMAT = '%Y%m%d'
+    RESYNC_DAYS = 3
+    AGGREGATED = False
+    COLUMNS = ['date', 'quantity', 'unit_price_vat_excl', 'country_code', 'brand', 'product_name', 'style']
+
+    @classmethod
+    def _read_state(cls):
+        path = os.path.join(cls.PATH, cls.STATE_FILE)
+        if not os.path.exists(path):
+            return None
+
+        with open(path) as f:
+            state = json.load(f)
+
+        return {
+            'from_date': dt.date.fromisoformat(state['from_date']),
+            'to_date': dt.date.fromisoformat(state['to_date']),
+        }
+
+    @classmethod
+    def _write_state(cls, from_date, to_date):
+        path = os.path.join(cls.PATH, cls.STATE_FILE)
+        with open(f'{path}.tmp', 'w') as f:
+            json.dump(
+                {
+                    'from_date': from_date.isoformat(),
+                    'to_date': to_date.isoformat(),
+                    'synced_at': dt.datetime.now().isoformat(),
+                },
+                f
+            )
+        os.replace(f'{path}.tmp', path)
+
+    @classmethod
+    def _day_path(cls, day):
+        return os.path.join(cls.PATH, f'{day.strftime(cls.DATE_FORMAT)}.parquet')
+
+    @classmethod
+    def _fetch(cls, from_date, to_date):
+        """
+        Downloads orders between from_date and to_date (inclusive) and rewrites their day partitions
+        """
+        logger.info(f'Orders store: fetching orders from {from_date} to {to_date}...')
+        # bez query cache => store vzdy dostane aktualne dni (a neuklada ich dvakrat)
+        df = get_orders(from_date=from_date, to_date=to_date, aggregated=cls.AGGREGATED, use_cache=False)
+        days = pd.to_datetime(df['date']).dt.normalize()
+
+        for x in range((to_date - from_date).days + 1):
+            day = from_date + dt.timedelta(days=x)
+            path = cls._day_path(day)
+            df_day = df[days == pd.Timestamp(day)]
+
+            if df_day.empty:
+                # order could be cancelled since the last sync
+                if os.path.exists(path):
+                    os.remove(path)
+                continue
+
+            df_day.to_parquet(f'{path}.tmp', index=False)
+            os.replace(f'{path}.tmp', path)
+
+    @classmethod
+    def sync(cls, from_date, to_date, resync_days=None):
+        """
+        Makes sure that the store contains all orders between from_date and to_date.
+
+        Parameters
+        ----------
+        from_date, to_date : datetime.date
+            Required date range (inclusive).
+        resync_days : int, optional
+            How many days before the high-water mark are downloaded again. Defaults to RESYNC_DAYS.
+        """
+        if resync_days is None:
+            resync_days = cls.RESYNC_DAYS
+
+        os.makedirs(cls.PATH, exist_ok=True)
+        state = cls._read_state()
+
+        if state is None:
+            cls._fetch(from_date, to_date)
+            cls._write_state(from_date, to_date)
+            return
+
+        # days older than anything in the store
+        if from_date < state['from_date']:
+            cls._fetch(from_date, state['from_date'] - dt.timedelta(days=1))
+
+        # days after the high-water mark + re-sync window before it
+        if to_date >= state['to_date']:
+            resync_from = max(state['to_date'] - dt.timedelta(days=resync_days), min(from_date, state['from_date']))
+            cls._fetch(resync_from, to_date)
+
+        cls._write_state(
+            min(from_date, state['from_date']),
+            max(to_date, state['to_date'])
+        )
+
+    @classmethod
+    def load(cls, styles=None, from_date=None, to_date=None, resync_days=None) -> pd.DataFrame:
+        """
+        Same as `get_orders`, but served from the local store.
+        """
+        if not from_date:
+            from_date = dt.date(2024,1,1)
+        if not to_date:
+            to_date = dt.date.today()
+
+        cls.sync(from_date, to_date, resync_days)
+
+        dataframes = []
+        for x in range((to_date - from_date).days + 1):
+            path = cls._day_path(from_date + dt.timedelta(days=x))
+            if os.path.exists(path):
+                dataframes.append(pd.read_parquet(path))
+
+        if not dataframes:
+            logger.info('Table is empty!!!')
+            return cls._dtypes(pd.DataFrame(columns=cls.COLUMNS))
+
+        df = cls._dtypes(pd.concat(dataframes, ignore_index=True))
+
+        if styles:
+            df = df[df['style'].isin(styles)]
+
+        return df
+
+    @classmethod
+    def _dtypes(cls, df):
+        return df
+
+class DailyOrdersStore(OrdersStore):
+    """
+    Same as `OrdersStore`, but keeps orders aggregated per style, country and day
+    (see `get_orders(aggregated=True)`)
+    """
+    PATH = './data/orders_daily'
+    AGGREGATED = True
+    COLUMNS = ['date', 'style', 'country_code', 'quantity']
+
+    @classmethod
+    def _dtypes(cls, df):
+        # categories of the day partitions differ => concat returns object columns
+        return _daily_orders_dtypes(df)
+
 def get_google_ads_data(from_date=None, to_date=dt.date.today()) -> pd.DataFrame:
     """
     Retrieve aggregated Google Ads performance data for Kickz campaigns.
@@ -339,18 +770,241 @@ def get_google_ads_data(from_date=None, to_date=dt.date.today()) -> pd.DataFrame
             LOWER(TRIM(a.style_id));
     """
 
-    with pyodbc.connect(CONNECTION_STRING) as con:
-        df = pd.read_sql(SQL,con)
+    SCHEMA = {
+        'date': 'datetime64[ns]',
+        'country_code': 'str',
+        'brand': 'str',
+        'style': 'str',
+        'impressions': 'int32',
+        'clicks': 'int32',
+        'cost': 'float64',
+    }
+    df = _read_sql(SQL, SCHEMA, name='get_google_ads_data')
     
     if df.empty:
         logger.info('Table is empty!!!')
         
     return df
 
+class ProductCatalogue:
+    """
+    Daily snapshot of the product catalogue ([rawone11].[v_pim_articles_data] of active 
+    Kickz items with category hierarchy from [product].[one11_styles] and live flag).
+
+    The catalogue is queried once per day and stored locally, all jobs (and all loaders
+    of one job) running the same day use the same snapshot:
+
+        catalogue = ProductCatalogue.load()
+        catalogue.by_style.loc['000544-bk-01', 'item_category']
+        catalogue.by_material_number.loc['4062064123456', 'style']
+    """
+    PATH = './data/product_catalogue'
+    DATE_FORMAT = '%Y%m%d'
+    KEEP_DAYS = 7
+    CATEGORY_COLUMNS = ['item_category', 'item_group0', 'item_group1', 'item_group2']
+    
+    _loaded = {}
+    _lock = threading.Lock()
+    
+    def __init__(self, df_articles, live_styles, day=None):
+        """
+        Parameters
+        ----------
+        df_articles : pandas.DataFrame
+            One row per article (material number): brand, product_name, style, 
+            material_number, item_category, item_group0-2, has_item_categories.
+        live_styles : set of str
+            Styles in stock on the web (also styles missing in PIM).
+        day : datetime.date, optional
+            Day of the snapshot.
+        """
+        self.day = day
+        self.articles = df_articles.assign(is_live = df_articles['style'].isin(live_styles))
+        self.live_styles = set(live_styles)
+        
+        self.by_style = self.articles.drop_duplicates('style').set_index('style')
+        self.by_material_number = self.articles.dropna(subset=['material_number'])\
+                                               .drop_duplicates('material_number')\
+                                               .set_index('material_number')
+    
+    @classmethod
+    def load(cls, day=None, refresh=False):
+        """
+        Returns catalogue snapshot of the day (default today). Snapshot is loaded from 
+        the database only if it is not stored locally yet (or refresh=True).
+        """
+        day = day or dt.date.today()
+        
+        with cls._lock:
+            if refresh or day not in cls._loaded:
+                cls._loaded = {day: cls._load_snapshot(day, refresh)}
+            
+            return cls._loaded[day]
+    
+    @classmethod
+    def _paths(cls, day):
+        name = day.strftime(cls.DATE_FORMAT)
+        return (
+            os.path.join(cls.PATH, f'{name}.parquet'),
+            os.path.join(cls.PATH, f'{name}_live_styles.parquet'),
+        )
+    
+    @classmethod
+    def _load_snapshot(cls, day, refresh):
+        articles_path, live_styles_path = cls._paths(day)
+        
+        if not refresh and os.path.exists(articles_path) and os.path.exists(live_styles_path):
+            logger.info(f'Loading product catalogue snapshot {articles_path}...')
+            return cls(
+                pd.read_parquet(articles_path), 
+                set(pd.read_parquet(live_styles_path)['style']),
+                day
+            )
+        
+        df_articles = cls._query_articles()
+        df_live_styles = cls._query_live_styles()
+        
+        os.makedirs(cls.PATH, exist_ok=True)
+        for df, path in [(df_articles, articles_path), (df_live_styles, live_styles_path)]:
+            df.to_parquet(f'{path}.tmp', index=False)
+            os.replace(f'{path}.tmp', path)
+        
+        cls._remove_old_snapshots(day)
+        
+        return cls(df_articles, set(df_live_styles['style']), day)
+    
+    @classmethod
+    def _remove_old_snapshots(cls, day):
+        oldest = (day - dt.timedelta(days=cls.KEEP_DAYS)).strftime(cls.DATE_FORMAT)
+        for file_name in os.listdir(cls.PATH):
+            if file_name.endswith('.parquet') and file_name[:8] < oldest:
+                os.remove(os.path.join(cls.PATH, file_name))
+    
+    @staticmethod
+    def _query_articles():
+        SQL = """
+            SELECT
+            DISTINCT
+                LOWER(TRIM(a.brand)) AS brand,
+                LTRIM(RTRIM(LOWER(TRIM(a.brand)) + ' ' + REPLACE(LOWER(TRIM(a.name)), LOWER(TRIM(a.brand)), ''))) AS product_name,
+                LOWER(TRIM(a.style_id)) AS style,
+                TRIM(a.material_number) AS material_number,
+                s.category AS item_category,
+                s.productDivision AS item_group0,
+                s.productSub AS item_group1,
+                s.productSubDivision AS item_group2,
+                IIF(s.style_id IS NULL, 0, 1) AS has_item_categories
+            FROM [rawone11].[v_pim_articles_data] AS a
+            LEFT JOIN [product].[one11_styles] AS s
+                ON s.brand = a.brand
+                AND s.style_id = a.style_id
+            WHERE a.item_shop_active_kickz = 1
+                AND a.name IS NOT NULL
+                AND a.style_id IS NOT NULL
+                AND a.brand IS NOT NULL
+        """
+        SCHEMA = {
+            'brand': 'category',
+            'product_name': 'str',
+            'style': 'str',
+            'material_number': 'str',
+            'item_category': 'str',
+            'item_group0': 'str',
+            'item_group1': 'str',
+            'item_group2': 'str',
+            'has_item_categories': 'bool',
+        }
+        df = _read_sql(SQL, SCHEMA, name='ProductCatalogue articles')
+        
+        if df.empty:
+            logger.info('Table is empty!!!')
+        
+        return df
+    
+    @staticmethod
+    def _query_live_styles():
+        SQL = """
+            SELECT
+                DISTINCT LOWER(TRIM(COALESCE(pim.style_id,ccv.colorVariantCode))) AS style
+            FROM
+                [rawOne11].[sap_ccv2] AS ccv
+            LEFT JOIN
+                rawone11.v_pim_articles_data AS pim
+            ON
+                pim.str_ean=ccv.ean
+            WHERE
+                stock > 0
+        """
+        df = _read_sql(SQL, {'style': 'str'}, name='ProductCatalogue live styles')
+        
+        if df.empty:
+            logger.info('Table is empty!!!')
+        
+        return df
+    
+    def products(self):
+        """
+        Unique brand, product_name, style of active products (see `get_all_products`)
+        """
+        return self.articles[['brand','product_name','style']].drop_duplicates().reset_index(drop=True)
+    
+    def material_numbers(self):
+        """
+        Unique brand, style, material_number (see `load_material_number_mapper`)
+        """
+        return self.articles[['brand','style','material_number']].drop_duplicates().reset_index(drop=True)
+    
+    def items_categories(self, styles=None, as_dict=False):
+        """
+        Brand, product_name, style and category hierarchy of styles which have 
+        categories (see `get_style_items_categories`)
+        """
+        df = self.articles[self.articles['has_item_categories']]
+        if styles:
+            df = df[df['style'].isin(styles)]
+        
+        df = df[['brand','product_name','style'] + self.CATEGORY_COLUMNS].drop_duplicates().reset_index(drop=True)
+        
+        if as_dict:
+            return df.drop_duplicates('style').set_index('style').to_dict(orient='index')
+        
+        return df
+
+def load_material_number_mapper():
+    """
+    Brand, style and material number of active products (from `ProductCatalogue`)
+    """
+    return ProductCatalogue.load().material_numbers()
+
+def get_all_products() -> pd.DataFrame:
+    """
+    Retrieve all products from the database for Kickz (from `ProductCatalogue`).
+
+    Returns
+    -------
+    pandas.DataFrame
+        A DataFrame with the following columns:
+        - brand (str): The product brand, in lowercase.
+        - product_name (str): The cleaned product name.
+        - style (str): The generic material number (style), in lowercase.
+    """
+    return ProductCatalogue.load().products()
+
+def get_live_styles() -> set:
+    """
+    Retrieve all active style codes (from `ProductCatalogue`)
+
+    Returns
+    -------
+    set of str
+        Unique lowercase style codes.
+    """
+    return ProductCatalogue.load().live_styles
+
 def get_style_items_categories(styles = None, as_dict=False) -> pd.DataFrame: 
     """
     Retrieve product metadata (brand, product name, style, and category hierarchy) 
-    for active Kickz items.
+    for active Kickz items (from `ProductCatalogue`).
 
     Parameters
     ----------
@@ -359,40 +1013,9 @@ def get_style_items_categories(styles = None, as_dict=False) -> pd.DataFrame:
     as_dict : bool, default False
         If True, return results as a dictionary keyed by style.
     """
-    SQL = f"""
-        SELECT
-        DISTINCT
-            LOWER(TRIM(a.brand)) AS brand,
-            LTRIM(RTRIM(LOWER(TRIM(a.brand)) + ' ' + REPLACE(LOWER(TRIM(a.name)), LOWER(TRIM(a.brand)), ''))) AS product_name,
-            LOWER(TRIM(a.style_id)) AS style,
-            s.category as item_category,
-            s.productDivision as item_group0,
-            s.productSub as item_group1,
-            s.productSubDivision as item_group2         
-        FROM [product].[one11_styles] AS s
-        INNER JOIN [rawone11].[v_pim_articles_data] AS a
-        ON s.brand = a.brand
-        AND s.style_id = a.style_id
-        WHERE a.item_shop_active_kickz = 1
-            AND a.name IS NOT NULL
-            AND a.style_id IS NOT NULL
-            AND a.brand IS NOT NULL
-        """
-        
-    with pyodbc.connect(CONNECTION_STRING) as c:
-        df = pd.read_sql(SQL, c)
-        
-    if styles:
-        df = df[df['style'].isin(styles)]
-        
-    if df.empty:
-        logger.info('Table is empty!!!')
-    
-    if as_dict:
-        return df.drop_duplicates('style').set_index('style').to_dict(orient='index')
-        
-    return df 
+    return ProductCatalogue.load().items_categories(styles, as_dict)
 
+@cached(CACHE, ttl=HOUR, unordered=('styles',), probe=_probe_prices)
 def load_prices(styles=None):
     """
     Load product pricing data from the database.
@@ -401,8 +1024,8 @@ def load_prices(styles=None):
     retrieve style, country code, currency, local sale price, and base price. 
     Filters out records with missing or zero values for `rrp` and `sale_price`. 
 
-    If a list of styles is provided, the result is further filtered to include 
-    only those styles.
+    If a list of styles is provided, only those styles are loaded (filtered 
+    on SQL Server through #styles temp table).
 
     Parameters
     ----------
@@ -420,52 +1043,175 @@ def load_prices(styles=None):
         - price_local
         - base_price_local
     """
-    SQL = """
+    SQL = f"""
         SELECT 
-            LOWER(TRIM(style)) AS style,
-            country AS country_code,
-            UPPER(currency) AS currency,
-            sale_price AS price_local,
-            rrp AS base_price_local
-        FROM [rawKickz].[product_sales_price]
+            LOWER(TRIM(p.style)) AS style,
+            p.country AS country_code,
+            UPPER(p.currency) AS currency,
+            p.sale_price AS price_local,
+            p.rrp AS base_price_local
+        FROM [rawKickz].[product_sales_price] AS p
+        {_styles_filter(styles, 'LOWER(TRIM(p.style))')}
         WHERE rrp IS NOT NULL
             AND rrp != 0
             AND sale_price IS NOT NULL
             AND sale_price != 0
     """
-    with pyodbc.connect(CONNECTION_STRING) as c:
-        df = pd.read_sql(SQL, c)
-        
-    if styles:
-        df = df[df['style'].isin(styles)]
+    SCHEMA = {
+        'style': 'str',
+        'country_code': 'category',
+        'currency': 'category',
+        'price_local': 'float64',
+        'base_price_local': 'float64',
+    }
+    df = _read_sql(SQL, SCHEMA, styles, name='load_prices')
         
     if df.empty:
         logger.info('Table is empty!!!')
         
     return df
 
+class BasePriceOverrides:
+    """
+    Manual base prices (UVP_KICKZ_EUR by material_number) from Excel files.
+
+    Every file is parsed only once: the typed table is stored as Parquet named by the 
+    sha256 of the file, (mtime, size) of the file is remembered so unchanged files are 
+    not even hashed. The style -> UVP_KICKZ_EUR map joined with the product catalogue 
+    is stored as well, keyed by hashes of all files and the catalogue day. Maps, tables 
+    and sidecars not used by the current files are removed after KEEP_DAYS days.
+
+    If material number is in several files, the first file wins.
+    """
+    FILES = ['AUTOMATIC PRICING BUCKETZ AND NEW ERA.xlsx']
+    PATH = './cache/base_price_overrides'
+    KEEP_DAYS = 7
+    
+    @classmethod
+    def _meta_path(cls, path):
+        return os.path.join(cls.PATH, hashlib.sha256(os.path.abspath(path).encode('utf-8')).hexdigest() + '.json')
+    
+    @classmethod
+    def _file_hash(cls, path):
+        """
+        sha256 of the file, computed only if (mtime, size) changed since the last run
+        """
+        stat = os.stat(path)
+        meta_path = cls._meta_path(path)
+        
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta['mtime'] == stat.st_mtime and meta['size'] == stat.st_size:
+                return meta['sha256']
+        
+        sha256 = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(2**20), b''):
+                sha256.update(chunk)
+        
+        with open(f'{meta_path}.tmp', 'w') as f:
+            json.dump({'path': path, 'mtime': stat.st_mtime, 'size': stat.st_size, 'sha256': sha256.hexdigest()}, f)
+        os.replace(f'{meta_path}.tmp', meta_path)
+        
+        return sha256.hexdigest()
+    
+    @classmethod
+    def _table(cls, path, file_hash):
+        """
+        Typed table material_number (str), UVP_KICKZ_EUR (float) of one file
+        """
+        table_path = os.path.join(cls.PATH, f'{file_hash}.parquet')
+        if os.path.exists(table_path):
+            return pd.read_parquet(table_path)
+        
+        logger.info(f'Parsing base price overrides {path}...')
+        df = pd.read_excel(path, usecols=['material_number','UVP_KICKZ_EUR'])\
+               .dropna()\
+               .astype({'material_number': str, 'UVP_KICKZ_EUR': 'float64'})
+        df['material_number'] = df['material_number'].str.strip()
+        
+        df.to_parquet(f'{table_path}.tmp', index=False)
+        os.replace(f'{table_path}.tmp', table_path)
+        
+        return df
+    
+    @classmethod
+    def load(cls, files=None):
+        """
+        Returns material_number, UVP_KICKZ_EUR of all files
+        """
+        files = files or cls.FILES
+        os.makedirs(cls.PATH, exist_ok=True)
+        
+        return pd.concat(
+            [cls._table(path, cls._file_hash(path)) for path in files], 
+            ignore_index=True
+        ).drop_duplicates('material_number')
+    
+    @classmethod
+    def style_map(cls, files=None, catalogue=None):
+        """
+        Returns pandas.Series style -> UVP_KICKZ_EUR
+        """
+        files = files or cls.FILES
+        if catalogue is None:
+            catalogue = ProductCatalogue.load()
+        os.makedirs(cls.PATH, exist_ok=True)
+        
+        file_hashes = [cls._file_hash(path) for path in files]
+        key = hashlib.sha256(
+            json.dumps([file_hashes, str(catalogue.day)]).encode('utf-8')
+        ).hexdigest()
+        map_path = os.path.join(cls.PATH, f'styles_{key}.parquet')
+        
+        if os.path.exists(map_path):
+            return pd.read_parquet(map_path).set_index('style')['UVP_KICKZ_EUR']
+        
+        df_map = cls.load(files)\
+                    .merge(catalogue.material_numbers(), on='material_number')[['style','UVP_KICKZ_EUR']]\
+                    .drop_duplicates('style')
+        
+        df_map.to_parquet(f'{map_path}.tmp', index=False)
+        os.replace(f'{map_path}.tmp', map_path)
+        
+        cls._remove_old_files(keep = {os.path.basename(map_path)}
+                                   | {f'{file_hash}.parquet' for file_hash in file_hashes}
+                                   | {os.path.basename(cls._meta_path(path)) for path in files})
+        
+        return df_map.set_index('style')['UVP_KICKZ_EUR']
+    
+    @classmethod
+    def _remove_old_files(cls, keep):
+        """
+        Removes maps of old catalogue days, tables of superseded versions of files and 
+        sidecars of removed files (not modified for KEEP_DAYS days, files in `keep` stay)
+        """
+        oldest = (dt.datetime.now() - dt.timedelta(days=cls.KEEP_DAYS)).timestamp()
+        for file_name in os.listdir(cls.PATH):
+            path = os.path.join(cls.PATH, file_name)
+            if file_name in keep or not file_name.endswith(('.parquet', '.json')):
+                continue
+            
+            try:
+                if os.stat(path).st_mtime < oldest:
+                    os.remove(path)
+            except OSError:
+                # odstraneny inym procesom
+                pass
+
 def get_prices_with_VAT(pricing_logic_data, as_dict=True):
     styles = pricing_logic_data['styles']
-    conversion_rates = pricing_logic_data['conversion_rates']
+    fx = pricing_logic_data['fx']
     
-    # processing
-    df_conersion_rates = pd.DataFrame(conversion_rates, index=['conversion_rate'])\
-                           .transpose()\
-                           .reset_index()\
-                           .rename(columns={'index': 'currency'})
+    # processing (ceny v menach bez kurzu sa vynechaju)
     df_prices = load_prices(styles)
-    df_prices = df_prices.merge(df_conersion_rates, on='currency')
-    df_prices['price_EUR'] = df_prices['price_local'] / df_prices['conversion_rate']
-    df_prices['base_price_EUR'] = df_prices['base_price_local'] / df_prices['conversion_rate']
+    df_prices = df_prices[fx.has(df_prices['currency'])].reset_index(drop=True)
+    df_prices['price_EUR'] = fx.convert(df_prices['price_local'], df_prices['currency'], 'EUR')
+    df_prices['base_price_EUR'] = fx.convert(df_prices['base_price_local'], df_prices['currency'], 'EUR')
     
     ########## TEMPORARY ########################
-    df_material_number = load_material_number_mapper()
-    df_manual_base_price = pd.read_excel(
-        'AUTOMATIC PRICING BUCKETZ AND NEW ERA.xlsx',
-        usecols=['material_number','UVP_KICKZ_EUR'],
-    ).dropna()
-    df_manual_base_price = df_manual_base_price[['material_number','UVP_KICKZ_EUR']].merge(df_material_number, on='material_number')
-    df_prices = df_prices.merge(df_manual_base_price, on='style', how='left')
+    df_prices['UVP_KICKZ_EUR'] = df_prices['style'].map(BasePriceOverrides.style_map())
     df_prices.loc[df_prices['UVP_KICKZ_EUR'].notna(), 'base_price_EUR'] = df_prices.loc[df_prices['UVP_KICKZ_EUR'].notna(), 'UVP_KICKZ_EUR']
     ########## TEMPORARY ########################
     
@@ -1062,6 +1808,13 @@ class S3ProductsToScore:
     CLIENT = 'kickz'
     FOLDER = 'products_to_score'
     DATE_FORMAT = '%Y%m%d%H%M%S'
+    MANIFEST = 'latest.json'
+    # pouzite ak nie je zapnuta spolocna S3 cache
+    DISK_CACHE = S3DiskCache('./cache/products_to_score', max_bytes=2**30)
+    
+    @staticmethod
+    def _manifest_key():
+        return f'{S3ProductsToScore.CLIENT}/{S3ProductsToScore.FOLDER}/{S3ProductsToScore.MANIFEST}'
                 
     @staticmethod
     def store(df):
@@ -1071,36 +1824,91 @@ class S3ProductsToScore:
         cols = df.select_dtypes('object').columns.tolist()
         df[cols] = df[cols].astype(str)
         
+        key = f'{S3ProductsToScore.CLIENT}/{S3ProductsToScore.FOLDER}/{timestamp}.parquet'
+        logger.info(f"Storing: s3://{S3ProductsToScore.BUCKET_NAME}/{key}...")
         
-        full_path = f's3://{S3ProductsToScore.BUCKET_NAME}/{S3ProductsToScore.CLIENT}/{S3ProductsToScore.FOLDER}/{timestamp}.parquet'
-        logger.info(f"Storing: {full_path}...")
-            
-        df.to_parquet(path=full_path, compression='gzip', index=False)
-            
+        buffer = io.BytesIO()
+        df.to_parquet(buffer, compression='gzip', index=False)
+        buffer.seek(0)
+        response = S3.store_file_in_bucket(
+            bucket_name = S3ProductsToScore.BUCKET_NAME,
+            file_name = key,
+            file = buffer
+        )
+        
+        # manifest s poslednou verziou => load_latest nemusi listovat cely folder
+        manifest = {
+            'key': key,
+            'etag': response['ETag'].strip('"'),
+            'rows': len(df),
+            'schema': {column: str(dtype) for column, dtype in df.dtypes.items()},
+            'stored_at': timestamp
+        }
+        S3.store_file_in_bucket(
+            bucket_name = S3ProductsToScore.BUCKET_NAME,
+            file_name = S3ProductsToScore._manifest_key(),
+            file = json.dumps(manifest)
+        )
+    
+    @staticmethod
+    def _load_manifest():
+        """
+        Returns manifest of the latest stored version. Manifest is built by listing 
+        the folder if it was not stored yet (versions stored before the manifest existed).
+        """
+        try:
+            return S3.get_file_from_bucket(
+                bucket_name = S3ProductsToScore.BUCKET_NAME,
+                file_name = S3ProductsToScore._manifest_key(),
+                as_json = True
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] not in ('NoSuchKey', '404'):
+                raise
+        
+        logger.warning(f'{S3ProductsToScore.MANIFEST} not found, listing {S3ProductsToScore.FOLDER}...')
+        latest = None
+        for obj in S3.iter_objects(
+            bucket_name = S3ProductsToScore.BUCKET_NAME, 
+            prefix = f'{S3ProductsToScore.CLIENT}/{S3ProductsToScore.FOLDER}/', 
+            suffix = '.parquet',
+            only_keys = False
+        ):
+            # kluce su zoradene => posledny je najnovsi
+            latest = obj
+        
+        if latest is None:
+            raise Exception(f'No {S3ProductsToScore.FOLDER} found in {S3ProductsToScore.BUCKET_NAME}!')
+        
+        return {'key': latest['Key'], 'etag': latest['ETag'].strip('"'), 'rows': None}
+    
+    @staticmethod
+    def _local_file(manifest):
+        """
+        Returns path to the local copy of the version in manifest, it is downloaded 
+        only if the cached copy has different ETag.
+        """
+        logger.info(f"Loading: s3://{S3ProductsToScore.BUCKET_NAME}/{manifest['key']}...")
+        return S3.get_local_file(
+            bucket_name = S3ProductsToScore.BUCKET_NAME, 
+            file_name = manifest['key'],
+            etag = manifest['etag'],
+            cache = S3.CACHE or S3ProductsToScore.DISK_CACHE
+        )
             
     @staticmethod        
     def load_latest(columns=None, query=None, **kwargs):     
-        file_names = sorted(
-            [
-                filename for filename in S3.get_all_objects_from_bucket(
-                    bucket_name = S3ProductsToScore.BUCKET_NAME, 
-                    prefix = f'{S3ProductsToScore.CLIENT}/{S3ProductsToScore.FOLDER}', 
-                    only_keys=True
-                )
-                if filename.endswith('.parquet')
-            ]
-        )
-        
-        # latest one
-        full_path = f's3://{S3ProductsToScore.BUCKET_NAME}/{file_names[-1]}'
-        logger.info(f"Loading: {full_path}...")
+        manifest = S3ProductsToScore._load_manifest()
         
         df = pd.read_parquet(
-            full_path, 
+            S3ProductsToScore._local_file(manifest), 
             columns = columns, 
             **kwargs
             )
         
+        if manifest['rows'] is not None and len(df) != manifest['rows']:
+            raise Exception(f"{manifest['key']}: {len(df)} rows loaded, {manifest['rows']} expected!")
+        
         if query is not None:
             df = df.query(query)
         
@@ -1136,26 +1944,34 @@ class S3RcmndHistory:
             df_date = df[df['date'] == date]
             
             filename = df_date['date'].dt.date.unique()[0].strftime(S3RcmndHistory.DATE_FORMAT)
-            full_path = f's3://{S3RcmndHistory.BUCKET_NAME}/{S3RcmndHistory.CLIENT}/{S3RcmndHistory.FOLDER}/{filename}.parquet'
             
-            df_date.to_parquet(path=full_path, compression='gzip', index=False)
+            buffer = io.BytesIO()
+            df_date.to_parquet(buffer, compression='gzip', index=False)
+            buffer.seek(0)
+            S3.store_file_in_bucket(bucket_name = S3RcmndHistory.BUCKET_NAME,
+                                    file_name = f'{S3RcmndHistory.CLIENT}/{S3RcmndHistory.FOLDER}/{filename}.parquet',
+                                    file = buffer)
+        
+        # znovu ulozeny den uz skompaktovaneho mesiaca sa musi citat z denneho suboru
+        S3RcmndHistory.archive().invalidate(df['date'].dt.date.unique())
             
     @staticmethod        
     def load_as_json(from_date, to_date, columns=None, query=None):
-        file_names = [
-            filename for filename in S3.get_all_objects_from_bucket(bucket_name = S3RcmndHistory.BUCKET_NAME, 
-                                                                    prefix = f'{S3RcmndHistory.CLIENT}/{S3RcmndHistory.FOLDER}', 
-                                                                    only_keys=True)
-            if filename.endswith('.json')
-        ]
-        
-        dates_to_download = [(from_date + dt.timedelta(days=x)).strftime(S3RcmndHistory.DATE_FORMAT) for x in range((to_date - from_date).days + 1)]
+        prefix = f'{S3RcmndHistory.CLIENT}/{S3RcmndHistory.FOLDER}/'
+        from_day = from_date.strftime(S3RcmndHistory.DATE_FORMAT)
+        to_day = to_date.strftime(S3RcmndHistory.DATE_FORMAT)
         
         dataframes = []
-        for file_name in file_names:
+        # listing zacne az od from_date a skonci za to_date
+        for file_name in S3.iter_objects(bucket_name = S3RcmndHistory.BUCKET_NAME, 
+                                         prefix = prefix, 
+                                         start_after = f'{prefix}{from_day}',
+                                         suffix = '.json'):
             file_date = file_name[file_name.rfind('/')+1:file_name.rfind('.')]
+            if file_date > to_day:
+                break
 
-            if file_date in dates_to_download:
+            if from_day <= file_date <= to_day:
                 logger.info(f"Rcmnd history loading {file_name}...")
                 json = S3.get_file_from_bucket(bucket_name= S3RcmndHistory.BUCKET_NAME, file_name=file_name)
                 df_date = pd.read_json(json)
@@ -1175,147 +1991,292 @@ class S3RcmndHistory:
 
         return pd.concat(dataframes, ignore_index=True)
             
+    @staticmethod
+    def archive():
+        return DailyParquetArchive(
+            f's3://{S3RcmndHistory.BUCKET_NAME}/{S3RcmndHistory.CLIENT}/{S3RcmndHistory.FOLDER}'
+        )
+    
+    @staticmethod
+    def _read_day(key, columns, filters, query, **kwargs):
+        """
+        Reads parquet of one day (or compacted month), returns None if it is missing. Columns and 
+        filters are applied by the Arrow reader, query before converting to pandas 
+        is not possible, so it is applied to the (already reduced) DataFrame of the day.
+        """
+        try:
+            if S3.CACHE is not None:
+                source = S3.get_local_file(S3RcmndHistory.BUCKET_NAME, key)
+            else:
+                source = S3.get_file_from_bucket(S3RcmndHistory.BUCKET_NAME, key)
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                return None
+            raise
+        
+        logger.info(f"Rcmnd history loading s3://{S3RcmndHistory.BUCKET_NAME}/{key}...")
+        df_date = pq.read_table(
+            source, 
+            columns = columns, 
+            filters = filters, 
+            **kwargs
+        ).to_pandas()
+        
+        if query is not None:
+            df_date = df_date.query(query)
+        
+        return df_date
+            
     @staticmethod        
-    def load(from_date, to_date, columns=None, query=None, literal_eval_cols=None, **kwargs):
+    def load(from_date, to_date, columns=None, query=None, literal_eval_cols=None, filters=None, max_workers=8, **kwargs):
+        """
+        Loads rcmnd history between from_date and to_date (including). 
+        
+        Keys are built from the dates (no listing of the folder) and days are 
+        downloaded in parallel. Days compacted by `run_compact_history.py` are read 
+        from the monthly files listed in the catalog of the archive.
+        
+        Params:
+            columns (list): columns to read
+            query (str): pandas query applied to every day
+            literal_eval_cols (list): columns converted by safe_literal_eval
+            filters (list): pyarrow filters, e.g. [('country_code', '=', 'DE')]
+            max_workers (int): number of parallel downloads
+            kwargs: passed to pyarrow.parquet.read_table
+        """
         if literal_eval_cols is None:
             literal_eval_cols = []
-            
-        file_names = [
-            filename for filename in S3.get_all_objects_from_bucket(bucket_name = S3RcmndHistory.BUCKET_NAME, 
-                                                                    prefix = f'{S3RcmndHistory.CLIENT}/{S3RcmndHistory.FOLDER}', 
-                                                                    only_keys=True)
-            if filename.endswith('.parquet')
-        ]
         
-        dates_to_download = [(from_date + dt.timedelta(days=x)).strftime(S3RcmndHistory.DATE_FORMAT) for x in range((to_date - from_date).days + 1)]
+        archive = S3RcmndHistory.archive()
+        compacted = archive.compacted_days()
+        monthly_files, daily_files = archive.plan(from_date, to_date, compacted)
+        prefix = f'{S3RcmndHistory.CLIENT}/{S3RcmndHistory.FOLDER}'
         
-        dataframes = []
-        for file_name in file_names:
-            file_date = file_name[file_name.rfind('/')+1:file_name.rfind('.')]
-
-            if file_date in dates_to_download:
-                full_path = f's3://{S3RcmndHistory.BUCKET_NAME}/{file_name}'
-                logger.info(f"Rcmnd history loading {full_path}...")
-                
-                df_date = pd.read_parquet(full_path, columns=columns, **kwargs)
-                
-                if query is not None:
-                    df_date = df_date.query(query)
-                    
-                for col in literal_eval_cols:
-                    if col in df_date.columns:
-                        df_date[col] = df_date[col].apply(lambda v: safe_literal_eval(v))
-                        
-                dataframes.append(df_date)
+        # z mesacnych suborov treba aj date, aby sa dali odfiltrovat dni mimo intervalu
+        monthly_columns = columns
+        if columns is not None and 'date' not in columns:
+            monthly_columns = list(columns) + ['date']
+        
+        def read(name):
+            if name in monthly_files:
+                df_month = S3RcmndHistory._read_day(f'{prefix}/{name}', monthly_columns, filters, query, **kwargs)
+                return archive.filter_days(df_month, from_date, to_date, compacted)[columns or df_month.columns]
+            
+            return S3RcmndHistory._read_day(f'{prefix}/{name}', columns, filters, query, **kwargs)
+        
+        names = monthly_files + daily_files
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(names)))) as executor:
+            dataframes = [
+                df_date for df_date in executor.map(read, names)
+                if df_date is not None
+            ]
 
         if not dataframes:
             raise Exception(f'Rcmnd history data not found between {from_date} and {to_date}')
+        
+        df = pd.concat(dataframes, ignore_index=True)
+        
+        for col in literal_eval_cols:
+            if col in df.columns:
+                df[col] = df[col].apply(safe_literal_eval)
 
-        return pd.concat(dataframes, ignore_index=True)
+        return df
     
-class S3RcmndHistory:
-    BUCKET_NAME = 'autopricing'
-    CLIENT = 'kickz'
-    FOLDER = 'rcmnd_history'
-    DATE_FORMAT = '%Y%m%d'
     
-    @staticmethod
-    def store_as_json(df):
-        df['date'] = pd.to_datetime(df['date'])
+def recommendations_backup_archive():
+    """
+    Local daily backups backup/df_recommendations_YYYYMMDD.parquet (see PricingLogic)
+    """
+    return DailyParquetArchive(
+        'backup', 
+        daily_name = 'df_recommendations_{day}.parquet',
+        monthly_name = 'monthly/df_recommendations_{month}.parquet'
+    )
+
+
+def load_recommendations_backup(from_date, to_date, columns=None, filters=None):
+    """
+    Loads backups of recommendations between from_date and to_date (including),
+    compacted months are read transparently.
+    """
+    return recommendations_backup_archive().read(from_date, to_date, columns=columns, filters=filters)
+    
+    
+class RcmndHistoryDataset:
+    """
+    Rcmnd history as hive partitioned Parquet dataset 
+    `{path}/day=YYYY-MM-DD/country_code=XX/part-0.parquet`.
+    
+    Rows are sorted by style and written in small row groups, so min/max 
+    statistics of row groups allow pyarrow to skip row groups of other styles. 
+    Queries like "style X over the last 90 days" read only partitions of the 
+    requested days (and countries) and only the row groups containing the style.
+    
+    Schema of the dataset is stored in `{path}/_common_metadata` and used for 
+    both writing and reading, so the type of a column does not depend on the day 
+    (e.g. column with only None values). Types of columns in SCHEMA are fixed, 
+    new columns get object => string, integer => float64.
+    
+    Example:
+        dataset = RcmndHistoryDataset()                        # S3
+        dataset = RcmndHistoryDataset('backup/rcmnd_history')  # local backups
+        df = dataset.read(from_date, to_date, styles=['DD1391-100'], columns=['style','date','recom_price'])
+    """
+    PATH = f's3://{S3RcmndHistory.BUCKET_NAME}/{S3RcmndHistory.CLIENT}/rcmnd_history_dataset'
+    ROW_GROUP_SIZE = 2_000
+    METADATA = '_common_metadata'
+    PARTITIONING = ds.partitioning(
+        pa.schema([('day', pa.string()), ('country_code', pa.string())]), 
+        flavor = 'hive'
+    )
+    SCHEMA = pa.schema([
+        ('date', pa.timestamp('ns')),
+        ('day', pa.string()),
+        ('country_code', pa.string()),
+        ('brand', pa.string()),
+        ('product_name', pa.string()),
+        ('style', pa.string()),
+        ('category', pa.string()),
+        ('item_category', pa.string()),
+        ('item_group0', pa.string()),
+        ('item_group1', pa.string()),
+        ('item_group2', pa.string()),
+        ('demand_key', pa.string()),
+        ('demand_key_original', pa.string()),
+        ('group_logic', pa.string()),
+        ('nodes_path', pa.string()),
+        ('recom_change', pa.string()),
+        ('price', pa.float64()),
+        ('price_from', pa.float64()),
+        ('base_price', pa.float64()),
+        ('price_original_currency', pa.float64()),
+        ('recom_price', pa.float64()),
+        ('purchase_price', pa.float64()),
+        ('last_changed_days_ago', pa.float64()),
+    ])
+    
+    def __init__(self, path=None):
+        self.path = path or self.PATH
+        self.filesystem, self.root = pafs.FileSystem.from_uri(
+            self.path if '://' in self.path else os.path.abspath(self.path)
+        )
+    
+    def schema(self):
+        """
+        Returns schema of the dataset (None if nothing was written yet)
+        """
+        path = f'{self.root}/{self.METADATA}'
+        if self.filesystem.get_file_info(path).type == pafs.FileType.NotFound:
+            return None
         
-        for date in df['date'].unique():
-            df_date = df[df['date'] == date]
-            
-            filename = df_date['date'].dt.date.unique()[0].strftime(S3RcmndHistory.DATE_FORMAT)
-            S3.store_file_in_bucket(bucket_name = S3RcmndHistory.BUCKET_NAME, 
-                                    file_name = f'{S3RcmndHistory.CLIENT}/{S3RcmndHistory.FOLDER}/{filename}.json', 
-                                    file = df_date.to_json())
-                
+        return pq.read_schema(path, filesystem=self.filesystem)
+    
     @staticmethod
-    def store(df):
+    def _field(name, dtype):
+        if dtype.kind in 'iuf':
+            return pa.field(name, pa.float64())
+        if dtype.kind == 'b':
+            return pa.field(name, pa.bool_())
+        if dtype.kind == 'M':
+            return pa.field(name, pa.timestamp('ns'))
+        
+        return pa.field(name, pa.string())
+    
+    def _to_table(self, df, schema):
+        df = df.copy()
         df['date'] = pd.to_datetime(df['date'])
+        df['day'] = df['date'].dt.strftime('%Y-%m-%d')
         
-        # convert to str
-        cols = df.select_dtypes('object').columns.tolist()
-        df[cols] = df[cols].astype(str)
-        
-        for date in df['date'].unique():
-            df_date = df[df['date'] == date]
-            
-            filename = df_date['date'].dt.date.unique()[0].strftime(S3RcmndHistory.DATE_FORMAT)
-            full_path = f's3://{S3RcmndHistory.BUCKET_NAME}/{S3RcmndHistory.CLIENT}/{S3RcmndHistory.FOLDER}/{filename}.parquet'
-            
-            df_date.to_parquet(path=full_path, compression='gzip', index=False)
-            
-    @staticmethod        
-    def load_as_json(from_date, to_date, columns=None, query=None):
-        file_names = [
-            filename for filename in S3.get_all_objects_from_bucket(bucket_name = S3RcmndHistory.BUCKET_NAME, 
-                                                                    prefix = f'{S3RcmndHistory.CLIENT}/{S3RcmndHistory.FOLDER}', 
-                                                                    only_keys=True)
-            if filename.endswith('.json')
-        ]
+        known = {field.name: field for field in self.SCHEMA}
+        for field in schema or []:
+            known.setdefault(field.name, field)
         
-        dates_to_download = [(from_date + dt.timedelta(days=x)).strftime(S3RcmndHistory.DATE_FORMAT) for x in range((to_date - from_date).days + 1)]
+        fields = [known.get(col) or self._field(col, df[col].dtype) for col in df.columns]
+        for field in fields:
+            if pa.types.is_string(field.type):
+                values = df[field.name].astype(object)
+                df[field.name] = values.astype(str).where(values.notna(), None)
         
-        dataframes = []
-        for file_name in file_names:
-            file_date = file_name[file_name.rfind('/')+1:file_name.rfind('.')]
-
-            if file_date in dates_to_download:
-                logger.info(f"Rcmnd history loading {file_name}...")
-                json = S3.get_file_from_bucket(bucket_name= S3RcmndHistory.BUCKET_NAME, file_name=file_name)
-                df_date = pd.read_json(json)
-                
-                if query is not None:
-                    df_date = df_date.query(query)
-                
-                if columns is not None:
-                    cols_to_take = set(df_date.columns).intersection(columns)
-                    df_date = df_date[cols_to_take]
-
-                dataframes.append(df_date)
-
-        if not dataframes:
-            raise Exception(f'Rcmnd history data not found between {from_date} and {to_date}')
-
-
-        return pd.concat(dataframes, ignore_index=True)
-            
-    @staticmethod        
-    def load(from_date, to_date, columns=None, query=None, literal_eval_cols=None, **kwargs):
-        if literal_eval_cols is None:
-            literal_eval_cols = []
+        df = df.sort_values(['day','country_code','style'], kind='stable')
+        return pa.Table.from_pandas(df, schema=pa.schema(fields), preserve_index=False)
+    
+    def write(self, df):
+        """
+        Writes recommendations, partitions (day, country_code) present in df are replaced.
+        """
+        schema = self.schema()
+        table = self._to_table(df, schema)
+        
+        # schema pred datami => citatelia vzdy poznaju vsetky zapisane stlpce
+        new_schema = table.schema if schema is None else pa.unify_schemas([schema, table.schema])
+        if schema is None or not new_schema.equals(schema):
+            self.filesystem.create_dir(self.root, recursive=True)
+            pq.write_metadata(new_schema, f'{self.root}/{self.METADATA}', filesystem=self.filesystem)
+        
+        logger.info(f'Rcmnd history dataset: writing {table.num_rows} rows to {self.path}...')
+        ds.write_dataset(
+            table,
+            self.root,
+            filesystem = self.filesystem,
+            format = 'parquet',
+            partitioning = self.PARTITIONING,
+            basename_template = 'part-{i}.parquet',
+            existing_data_behavior = 'delete_matching',
+            file_options = ds.ParquetFileFormat().make_write_options(compression='zstd'),
+            preserve_order = True,
+            min_rows_per_group = self.ROW_GROUP_SIZE,
+            max_rows_per_group = self.ROW_GROUP_SIZE
+        )
+    
+    def dataset(self):
+        return ds.dataset(
+            self.root, 
+            schema = self.schema(),
+            filesystem = self.filesystem, 
+            format = 'parquet', 
+            partitioning = self.PARTITIONING
+        )
+    
+    def read(self, from_date=None, to_date=None, styles=None, country_codes=None, columns=None, filter=None):
+        """
+        Reads rcmnd history, all conditions are pushed down to the dataset scan
+        (partition pruning by day/country_code, row group pruning by style).
+        
+        Params:
+            from_date, to_date (datetime.date): days to read (including)
+            styles (list): styles to read
+            country_codes (list): countries to read
+            columns (list): columns to read
+            filter (pyarrow.dataset.Expression): additional filter, e.g. ds.field('recom_change') == 'DECREASE'
+        """
+        conditions = []
+        if from_date is not None:
+            conditions.append(ds.field('day') >= pd.Timestamp(from_date).strftime('%Y-%m-%d'))
+        if to_date is not None:
+            conditions.append(ds.field('day') <= pd.Timestamp(to_date).strftime('%Y-%m-%d'))
+        if styles is not None:
+            conditions.append(ds.field('style').isin(list(styles)))
+        if country_codes is not None:
+            conditions.append(ds.field('country_code').isin(list(country_codes)))
+        if filter is not None:
+            conditions.append(filter)
+        
+        expression = None
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+        
+        return self.dataset().to_table(columns=columns, filter=expression).to_pandas()
+    
+    def import_daily_files(self, from_date, to_date):
+        """
+        Backfills the dataset from daily S3RcmndHistory files.
+        """
+        for x in range((to_date - from_date).days + 1):
+            day = from_date + dt.timedelta(days=x)
+            try:
+                df = S3RcmndHistory.load(day, day)
+            except Exception as e:
+                logger.warning(e)
+                continue
             
-        file_names = [
-            filename for filename in S3.get_all_objects_from_bucket(bucket_name = S3RcmndHistory.BUCKET_NAME, 
-                                                                    prefix = f'{S3RcmndHistory.CLIENT}/{S3RcmndHistory.FOLDER}', 
-                                                                    only_keys=True)
-            if filename.endswith('.parquet')
-        ]
-        
-        dates_to_download = [(from_date + dt.timedelta(days=x)).strftime(S3RcmndHistory.DATE_FORMAT) for x in range((to_date - from_date).days + 1)]
-        
-        dataframes = []
-        for file_name in file_names:
-            file_date = file_name[file_name.rfind('/')+1:file_name.rfind('.')]
-
-            if file_date in dates_to_download:
-                full_path = f's3://{S3RcmndHistory.BUCKET_NAME}/{file_name}'
-                logger.info(f"Rcmnd history loading {full_path}...")
-                
-                df_date = pd.read_parquet(full_path, columns=columns, **kwargs)
-                
-                if query is not None:
-                    df_date = df_date.query(query)
-                    
-                for col in literal_eval_cols:
-                    if col in df_date.columns:
-                        df_date[col] = df_date[col].apply(lambda v: safe_literal_eval(v))
-                        
-                dataframes.append(df_date)
-
-        if not dataframes:
-            raise Exception(f'Rcmnd history data not found between {from_date} and {to_date}')
-
-        return pd.concat(dataframes, ignore_index=True)
+            self.write(df.replace('None', np.nan))
@@ -1,11 +1,19 @@
+import time
 import logging
-from typing import Union
+from typing import Callable, Optional, Union
 
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 from google.cloud import bigquery
 from google.oauth2 import service_account
 
+try:
+    from google.cloud import bigquery_storage
+except ImportError:  # optional, only for use_bqstorage=True
+    bigquery_storage = None
+
 logger = logging.getLogger(__name__)
 
 # NOTE: Set the GOOGLE_APPLICATION_CREDENTIALS environment variable with the path to the JSON auth file.
@@ -67,6 +75,27 @@ class BigQuery:
             **kwargs: Keyword arguments passed to bigquery.Client.
         """
         self.client = bigquery.Client(**kwargs)
+        self.credentials = kwargs.get("credentials")
+        self.bqstorage_client = None
+
+    @classmethod
+    def from_client(cls, client, bqstorage_client=None) -> "BigQuery":
+        """
+        Instantiates the class with an already created client, e.g. LocalBigQueryClient for offline runs.
+
+        Args:
+            client: bigquery.Client or a compatible stand-in.
+            bqstorage_client: BigQueryReadClient or a compatible stand-in used by use_bqstorage=True,
+                None => created from the default credentials when needed.
+
+        Returns:
+            BigQuery: An instance of the BigQuery client wrapper.
+        """
+        instance = cls.__new__(cls)
+        instance.client = client
+        instance.credentials = None
+        instance.bqstorage_client = bqstorage_client
+        return instance
 
     @classmethod
     def from_json_credentials(cls, json_credentials: dict) -> "BigQuery":
@@ -82,18 +111,99 @@ class BigQuery:
         credentials = service_account.Credentials.from_service_account_info(json_credentials)
         return cls(credentials=credentials)
 
-    def get_data_from_query(self, sql: str) -> pd.DataFrame:
+    def get_data_from_query(
+        self,
+        sql: str,
+        use_bqstorage: bool = False,
+        dtypes: Optional[dict] = None,
+        progress_interval: float = 5.0,
+    ) -> pd.DataFrame:
         """
         Executes a SQL query and returns the result as a DataFrame.
 
         Args:
             sql (str): SQL query to execute.
+            use_bqstorage (bool): If True, download the result through the BigQuery Storage Read API
+                as Arrow record batches instead of paginated REST JSON. Falls back to REST
+                (with a warning) if google-cloud-bigquery-storage is not available.
+            dtypes (dict | None): Column name -> dtype of the returned DataFrame, e.g. {'country_code': 'category'}.
+            progress_interval (float): Minimum number of seconds between two progress logs (Storage Read API only).
 
         Returns:
             pd.DataFrame: Query results.
         """
         logger.info("Running query and fetching results.")
-        return self.client.query(sql).to_dataframe()
+        rows = self.client.query(sql).result()
+
+        bqstorage_client = self._get_bqstorage_client() if use_bqstorage else None
+        if bqstorage_client is None:
+            return self._apply_dtypes(rows.to_dataframe(), dtypes)
+
+        table = self._download_arrow(rows, bqstorage_client, progress_interval)
+
+        # categoricals are dictionary encoded already in Arrow, to_pandas converts them without copying strings
+        for column, dtype in (dtypes or {}).items():
+            if dtype == "category" and column in table.column_names:
+                index = table.column_names.index(column)
+                table = table.set_column(index, column, pc.dictionary_encode(table.column(column)))
+
+        return self._apply_dtypes(table.to_pandas(), dtypes)
+
+    def _get_bqstorage_client(self):
+        """
+        Returns Storage Read API client (created once), None if it can not be created.
+        """
+        if self.bqstorage_client is not None:
+            return self.bqstorage_client
+
+        if bigquery_storage is None:
+            logger.warning("google-cloud-bigquery-storage is not installed, downloading through REST API.")
+            return None
+
+        try:
+            self.bqstorage_client = bigquery_storage.BigQueryReadClient(credentials=self.credentials)
+        except Exception:
+            logger.warning("BigQuery Storage client can not be created, downloading through REST API.", exc_info=True)
+
+        return self.bqstorage_client
+
+    def _download_arrow(self, rows, bqstorage_client, progress_interval: float) -> pa.Table:
+        """
+        Downloads query result through the Storage Read API as Arrow table and logs progress and throughput.
+        """
+        total_rows = rows.total_rows or 0
+        start = last_log = time.monotonic()
+        batches = []
+        downloaded_rows = downloaded_bytes = 0
+
+        for batch in rows.to_arrow_iterable(bqstorage_client=bqstorage_client):
+            batches.append(batch)
+            downloaded_rows += batch.num_rows
+            downloaded_bytes += batch.nbytes
+
+            now = time.monotonic()
+            if now - last_log >= progress_interval:
+                last_log = now
+                logger.info(
+                    f"Downloaded {downloaded_rows}/{total_rows} rows "
+                    f"({downloaded_rows / max(total_rows, 1):.0%}), {downloaded_bytes / 2**20:.1f} MB"
+                )
+
+        elapsed = max(time.monotonic() - start, 1e-9)
+        logger.info(
+            f"Downloaded {downloaded_rows} rows, {downloaded_bytes / 2**20:.1f} MB in {elapsed:.1f}s "
+            f"({downloaded_rows / elapsed:.0f} rows/s, {downloaded_bytes / 2**20 / elapsed:.1f} MB/s)"
+        )
+
+        if not batches:
+            return pa.schema([pa.field(field.name, pa.null()) for field in rows.schema]).empty_table()
+
+        return pa.Table.from_batches(batches)
+
+    @staticmethod
+    def _apply_dtypes(df: pd.DataFrame, dtypes: Optional[dict]) -> pd.DataFrame:
+        dtypes = {column: dtype for column, dtype in (dtypes or {}).items() if column in df.columns}
+        return df.astype(dtypes) if dtypes else df
 
     def insert_many(self, df: pd.DataFrame, table_name: str, streaming: bool = False) -> None:
         """
@@ -160,4 +270,57 @@ class BigQuery:
         self.client.create_dataset(dataset=bq_table.dataset_id, exists_ok=True)
         result = self.client.create_table(bq_table, exists_ok=True)
 
-        logger.info(f"Table created: {result.project}.{result.dataset_id}.{result.table_id}")
\ No newline at end of file
+        logger.info(f"Table created: {result.project}.{result.dataset_id}.{result.table_id}")
+
+
+class LocalBigQueryClient:
+    """
+    Offline stand-in for bigquery.Client supporting what BigQuery.get_data_from_query needs
+    (both REST and Storage Read API paths, pass it also as `bqstorage_client` for the latter).
+
+    Example:
+        client = LocalBigQueryClient(lambda sql: pd.read_parquet("competitors.parquet"))
+        bq = BigQuery.from_client(client, bqstorage_client=client)
+        df = bq.get_data_from_query(sql, use_bqstorage=True, dtypes={"country_code": "category"})
+    """
+
+    def __init__(self, results: Union[pd.DataFrame, Callable[[str], pd.DataFrame]], batch_size: int = 10_000):
+        """
+        Args:
+            results (pd.DataFrame | callable): Result returned for every query, or callable sql -> DataFrame.
+            batch_size (int): Number of rows in one Arrow record batch.
+        """
+        self.results = results
+        self.batch_size = batch_size
+        self.queries = []
+
+    def query(self, sql: str) -> "_LocalQueryJob":
+        self.queries.append(sql)
+        df = self.results(sql) if callable(self.results) else self.results
+        return _LocalQueryJob(pa.Table.from_pandas(df, preserve_index=False), self.batch_size)
+
+
+class _LocalQueryJob:
+    def __init__(self, table: pa.Table, batch_size: int):
+        self.table = table
+        self.batch_size = batch_size
+
+    def result(self) -> "_LocalRowIterator":
+        return _LocalRowIterator(self.table, self.batch_size)
+
+    def to_dataframe(self) -> pd.DataFrame:
+        return self.result().to_dataframe()
+
+
+class _LocalRowIterator:
+    def __init__(self, table: pa.Table, batch_size: int):
+        self.table = table
+        self.batch_size = batch_size
+        self.total_rows = table.num_rows
+        self.schema = [bigquery.SchemaField(name, "STRING") for name in table.column_names]
+
+    def to_arrow_iterable(self, bqstorage_client=None):
+        yield from self.table.to_batches(max_chunksize=self.batch_size)
+
+    def to_dataframe(self) -> pd.DataFrame:
+        return self.table.to_pandas()
@@ -0,0 +1,189 @@
+import os
+import logging
+import threading
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+import requests
+import xmltodict
+
+from libs.utils import retry
+
+logger = logging.getLogger(__name__)
+
+ECB_DAILY_URL = 'https://www.ecb.europa.eu/stats/eurofxref/eurofxref-daily.xml'
+ECB_HISTORY_URL = 'https://www.ecb.europa.eu/stats/eurofxref/eurofxref-hist-90d.xml'
+
+
+class FxRates:
+    """
+    ECB reference rates (units of currency for 1 EUR) persisted as a dated table on local disk.
+
+    `latest()` serves the latest stored rates without waiting for ECB, the table is
+    refreshed in a background thread (for the next run). ECB is called synchronously
+    only if there are no rates stored yet or the stored ones are older than `max_stale_days`.
+
+    Example:
+        fx = FxRates('./data/fx_rates.parquet')
+        rates = fx.latest()                                     # {'EUR': 1.0, 'USD': 1.08, ...}
+        df['price_EUR'] = fx.convert(df['price'], df['currency'], 'EUR')
+    """
+    COLUMNS = ['date', 'currency', 'rate']
+
+    def __init__(self, path, max_stale_days=4, timeout=10):
+        """
+        Args:
+            path (str): Parquet file with the rates table (date, currency, rate).
+            max_stale_days (int): Stored rates older than this are refreshed before they are served
+                                  (ECB does not publish on weekends and holidays).
+            timeout (float): Timeout of ECB requests in seconds.
+        """
+        self.path = path
+        self.max_stale_days = max_stale_days
+        self.timeout = timeout
+
+        self.rates_date = None
+        self.rates = None
+        self._codes = None
+        self._values = None
+        self._lock = threading.Lock()
+        self._refresh_thread = None
+
+    def _read_table(self):
+        if not os.path.exists(self.path):
+            return pd.DataFrame(columns=self.COLUMNS)
+
+        return pd.read_parquet(self.path)
+
+    def _write_table(self, df):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        df.to_parquet(f'{self.path}.tmp', index=False)
+        os.replace(f'{self.path}.tmp', self.path)
+
+    @retry(requests.RequestException, total_tries=3, initial_wait=5, logger=logger)
+    def _download(self, url):
+        response = requests.get(url, timeout=self.timeout)
+        response.raise_for_status()
+
+        days = xmltodict.parse(response.content)['gesmes:Envelope']['Cube']['Cube']
+        if isinstance(days, dict):
+            days = [days]
+
+        rows = []
+        for day in days:
+            date = pd.Timestamp(day['@time'])
+            rows.append({'date': date, 'currency': 'EUR', 'rate': 1.0})
+            for row in day['Cube']:
+                rows.append({'date': date, 'currency': row['@currency'], 'rate': float(row['@rate'])})
+
+        return pd.DataFrame(rows, columns=self.COLUMNS)
+
+    def refresh(self):
+        """
+        Downloads rates from ECB and stores them in the table (90 days history if the table is empty).
+        """
+        with self._lock:
+            df_table = self._read_table()
+            df_new = self._download(ECB_HISTORY_URL if df_table.empty else ECB_DAILY_URL)
+
+            df_table = pd.concat([df_table, df_new], ignore_index=True)\
+                         .astype({'date': 'datetime64[ns]', 'currency': str, 'rate': float})\
+                         .drop_duplicates(['date', 'currency'], keep='last')\
+                         .sort_values(['date', 'currency'])\
+                         .reset_index(drop=True)
+            self._write_table(df_table)
+
+        logger.info(f'FX rates refreshed, latest date {df_table["date"].max().date()}')
+        return df_table
+
+    def refresh_in_background(self):
+        """
+        Starts refresh in a daemon thread (errors are only logged, stored rates stay as they are).
+        """
+        def run():
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception('FX rates background refresh failed!')
+
+        if self._refresh_thread is None or not self._refresh_thread.is_alive():
+            self._refresh_thread = threading.Thread(target=run, name='fx-refresh', daemon=True)
+            self._refresh_thread.start()
+
+    def latest(self):
+        """
+        Returns latest stored rates {'EUR': 1.0, 'USD': 1.08, ...} and uses them for `convert`.
+
+        Raises Exception if there are no rates at all (instead of falling back to EUR only).
+        """
+        df_table = self._read_table()
+        today = pd.Timestamp(dt.date.today())
+
+        if df_table.empty or (today - df_table['date'].max()).days > self.max_stale_days:
+            logger.info('FX rates are missing or stale, refreshing from ECB...')
+            try:
+                df_table = self.refresh()
+            except Exception:
+                if df_table.empty:
+                    raise
+                logger.exception(f'FX rates refresh failed, using rates from {df_table["date"].max().date()}!')
+        else:
+            self.refresh_in_background()
+
+        self.rates_date = df_table['date'].max()
+        df_latest = df_table[df_table['date'] == self.rates_date]
+        self._set_rates(dict(zip(df_latest['currency'], df_latest['rate'])))
+
+        logger.info(f'FX rates from {self.rates_date.date()}: {len(self.rates)} currencies')
+        return dict(self.rates)
+
+    def _set_rates(self, rates):
+        self.rates = rates
+        self._codes = pd.Index(list(rates))
+        self._values = np.array(list(rates.values()), dtype=float)
+
+    def _rates_of(self, currencies):
+        """
+        Maps currency codes (scalar or array) to rates through the index of known codes
+        """
+        if np.ndim(currencies) == 0:
+            currencies = [currencies]
+
+        positions = self._codes.get_indexer(np.asarray(currencies, dtype=object))
+        if (positions < 0).any():
+            unknown = sorted(set(np.asarray(currencies, dtype=object)[positions < 0]))
+            raise KeyError(f'Unknown currencies: {unknown}')
+
+        return self._values[positions]
+
+    def convert(self, amounts, from_ccy, to_ccy):
+        """
+        Converts amounts between currencies using rates loaded by `latest()`.
+
+        Args:
+            amounts (array-like | float): Amounts in `from_ccy`.
+            from_ccy (array-like | str): Currency code(s) of the amounts.
+            to_ccy (array-like | str): Target currency code(s).
+
+        Returns:
+            numpy.ndarray (pandas.Series with the same index if `amounts` is Series)
+        """
+        if self.rates is None:
+            self.latest()
+
+        values = np.asarray(amounts, dtype=float) / self._rates_of(from_ccy) * self._rates_of(to_ccy)
+
+        if isinstance(amounts, pd.Series):
+            return pd.Series(values, index=amounts.index, name=amounts.name)
+
+        return values
+
+    def has(self, currencies):
+        """
+        Boolean mask of currencies which can be converted
+        """
+        if self.rates is None:
+            self.latest()
+
+        return self._codes.get_indexer(np.asarray(currencies, dtype=object)) >= 0
@@ -3,6 +3,7 @@ import numpy as np
 import pickle
 import os.path
 import socket
+import threading
 
 from libs.utils import retry
 from googleapiclient.discovery import build
@@ -17,9 +18,17 @@ logger = logging.getLogger(__name__)
 
 class GoogleSheetsApi:
     
-    def __init__(self, path_token, path_client_secret):
-        self.service = self.__login_to_gapi(path_token = path_token,
-                                            path_client_secret = path_client_secret)
+    def __init__(self, path_token, path_client_secret, snapshot_dir=None):
+        """
+        snapshot_dir (str or None): priecinok pre lokalne snapshoty skompilovanej konfiguracie
+                                    (vid. load_snapshot), None => snapshoty sa nepouzivaju
+        """
+        creds = self.__login_to_gapi(path_token = path_token,
+                                     path_client_secret = path_client_secret)
+        
+        self.service = build('sheets', 'v4', credentials=creds, cache_discovery=False)
+        self.drive_service = build('drive', 'v3', credentials=creds, cache_discovery=False)
+        self.snapshot_dir = snapshot_dir
     
     def __login_to_gapi(self, path_token, path_client_secret):
         
@@ -46,9 +55,7 @@ class GoogleSheetsApi:
             with open(path_token, 'wb') as token:
                 pickle.dump(creds, token)
 
-        service = build('sheets', 'v4', credentials=creds, cache_discovery=False)
-
-        return service
+        return creds
     
     
     def get_tabs_names(self, sample_spredsheet_id):
@@ -66,9 +73,33 @@ class GoogleSheetsApi:
                       .get(spreadsheetId = sample_spredsheet_id,
                            range = sample_range_name)\
                       .execute()
-        
-        values = result.get('values', [])
 
+        return self.__values2df(result.get('values', []), sample_range_name)
+
+    def google_sheets2dfs(self, sample_spredsheet_id, sample_range_names):
+        """
+        Nacita viacero rozsahov (tabov) jednym volanim spreadsheets.values.batchGet
+
+        Returns:
+            dict {range_name: DataFrame alebo None ak v rozsahu nie su data}
+        """
+        if not sample_range_names:
+            return {}
+
+        # Call the Sheets API
+        sheet = self.service.spreadsheets()
+        result = sheet.values()\
+                      .batchGet(spreadsheetId = sample_spredsheet_id,
+                                ranges = list(sample_range_names))\
+                      .execute()
+
+        # valueRanges su v rovnakom poradi ako poziadavky
+        return {
+            range_name: self.__values2df(value_range.get('values', []), range_name)
+            for range_name, value_range in zip(sample_range_names, result.get('valueRanges', []))
+        }
+
+    def __values2df(self, values, sample_range_name):
         if not values:
             logger.warning(f'Data not found in {sample_range_name}!')
             return None
@@ -95,6 +126,117 @@ class GoogleSheetsApi:
 
             return df
     
+    def get_revision(self, sample_spredsheet_id):
+        """
+        Vrati aktualnu verziu spreadsheetu z Drive API
+        
+        Returns:
+            dict {'version': '1234', 'modifiedTime': '2024-01-01T10:00:00.000Z'}
+        """
+        return self.drive_service.files()\
+                                 .get(fileId = sample_spredsheet_id,
+                                      fields = 'version,modifiedTime',
+                                      supportsAllDrives = True)\
+                                 .execute()
+    
+    def get_last_foreign_revision(self, sample_spredsheet_id):
+        """
+        Vrati id poslednej revizie spreadsheetu, ktoru neurobil tento ucet, t.j. poslednu 
+        zmenu okrem nasich vlastnych zapisov (napr. EXPORT, products_to_score). 
+        None ak taka revizia nie je.
+        """
+        revision_id, page_token = None, None
+        while True:
+            response = self.drive_service.revisions()\
+                                         .list(fileId = sample_spredsheet_id,
+                                               fields = 'nextPageToken,revisions(id,lastModifyingUser(me))',
+                                               pageSize = 1000,
+                                               pageToken = page_token)\
+                                         .execute()
+            
+            # revizie su zoradene od najstarsej
+            for revision in response.get('revisions', []):
+                if not revision.get('lastModifyingUser', {}).get('me', False):
+                    revision_id = revision['id']
+            
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                return revision_id
+    
+    def load_snapshot(self, sample_spredsheet_id, snapshot_name, compile_func, required_keys=None):
+        """
+        Vrati skompilovanu konfiguraciu zo spreadsheetu.
+        
+        Ak sa spreadsheet od vytvorenia lokalneho snapshotu nezmenil (rovnaka Drive verzia), 
+        alebo ho odvtedy menili len nase vlastne zapisy (rovnaka posledna revizia ineho uctu, 
+        vid. get_last_foreign_revision), vrati data zo snapshotu bez citania tabov. 
+        Inak zavola compile_func a vysledok ulozi.
+        
+        Params:
+            snapshot_name (str): nazov snapshotu (napr. 'pricing_logic')
+            compile_func (callable): bez argumentov, vrati (data, tabs) kde data je 
+                                     skompilovana konfiguracia a tabs zoznam tabov z ktorych vznikla
+            required_keys (list or None): kluce ktore musia byt v data, inak sa snapshot 
+                                          povazuje za neplatny (napr. po zmene kodu)
+        """
+        if not self.snapshot_dir:
+            data, _ = compile_func()
+            return data
+        
+        revision = self.get_revision(sample_spredsheet_id)
+        path = self.__snapshot_path(sample_spredsheet_id, snapshot_name)
+        snapshot = self.__read_snapshot(path)
+        usable = snapshot is not None and set(required_keys or []) <= set(snapshot['data'])
+        
+        if usable and snapshot['version'] == revision['version']:
+            logger.info(f'Using snapshot "{snapshot_name}" (version {revision["version"]}, modified {revision["modifiedTime"]})')
+            return snapshot['data']
+        
+        # verzia sa zmenila, ale mohol to byt len nas zapis (jobs zapisuju do toho isteho spreadsheetu)
+        foreign_revision = self.get_last_foreign_revision(sample_spredsheet_id)
+        if usable and 'foreign_revision' in snapshot and snapshot['foreign_revision'] == foreign_revision:
+            logger.info(f'Using snapshot "{snapshot_name}" (only own writes since version {snapshot["version"]})')
+            return snapshot['data']
+        
+        logger.info(f'Snapshot "{snapshot_name}" is outdated, compiling from version {revision["version"]}...')
+        data, tabs = compile_func()
+        
+        # verzia a revizia su zistene pred citanim tabov => ak sa sheet medzi tym zmenil, 
+        # snapshot bude pri dalsom behu neplatny
+        self.__write_snapshot(path, {
+            'version': revision['version'],
+            'foreign_revision': foreign_revision,
+            'modified_time': revision['modifiedTime'],
+            'tabs': list(tabs),
+            'data': data
+        })
+        
+        return data
+    
+    def __snapshot_path(self, sample_spredsheet_id, snapshot_name):
+        return os.path.join(self.snapshot_dir, f'{sample_spredsheet_id}__{snapshot_name}.pickle')
+    
+    def __read_snapshot(self, path):
+        if not os.path.exists(path):
+            return None
+        
+        try:
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except Exception:
+            logger.exception(f'Snapshot {path} can not be loaded!')
+            return None
+    
+    def __write_snapshot(self, path, snapshot):
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        
+        # zapis cez docasny subor aby paralelny beh necital rozpisany snapshot,
+        # unikatny nazov aby sa dva behy neprepisali
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(snapshot, f)
+        os.replace(tmp_path, path)
+    
     @retry(Exception, total_tries=5, initial_wait=60, backoff_factor=2, logger=logger)    
     def delete_cell_values(self, sample_spredsheet_id, sample_range_name):
         response = ''
@@ -0,0 +1,187 @@
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+logger = logging.getLogger(__name__)
+
+# how often (seconds) running loaders are checked against their timeouts
+TIMEOUT_POLL_INTERVAL = 1.0
+
+
+class LoaderScheduler:
+    """
+    Runs I/O-bound loaders concurrently while respecting their declared inputs.
+
+    Every loader is registered with the names of the loaders it depends on. As soon
+    as all dependencies of a loader are finished, the loader is submitted to a bounded
+    thread pool, so independent sources are fetched at the same time and the whole
+    stage takes roughly as long as its critical path.
+
+    Example:
+        scheduler = LoaderScheduler(max_workers=4)
+        scheduler.add('rates', load_rates, timeout=60)
+        scheduler.add('prices', load_prices, depends_on=['rates'])
+        scheduler.run()
+    """
+
+    def __init__(self, max_workers=4, default_timeout=None):
+        """
+        Args:
+            max_workers (int): Maximum number of loaders running at the same time.
+            default_timeout (float | None): Timeout in seconds used for loaders registered without one.
+        """
+        self.max_workers = max_workers
+        self.default_timeout = default_timeout
+        self.loaders = {}
+        self.stats = {}
+        self.critical_path = []
+
+    def add(self, name, func, depends_on=None, timeout=None):
+        """
+        Registers loader.
+
+        Args:
+            name (str): Unique loader name, used in `depends_on` of other loaders.
+            func (callable): Callable without arguments doing the actual loading.
+            depends_on (list[str] | None): Names of loaders which must finish before this one starts.
+            timeout (float | None): Maximum running time in seconds. Falls back to `default_timeout`.
+
+        Returns:
+            LoaderScheduler: self, so calls can be chained.
+        """
+        if name in self.loaders:
+            raise Exception(f'Loader "{name}" is already registered!')
+
+        self.loaders[name] = {
+            'func': func,
+            'depends_on': list(depends_on or []),
+            'timeout': timeout if timeout is not None else self.default_timeout,
+        }
+
+        return self
+
+    def _validate(self):
+        """
+        Checks that all dependencies exist and that there is no cycle between loaders.
+        """
+        for name, loader in self.loaders.items():
+            unknown = [dep for dep in loader['depends_on'] if dep not in self.loaders]
+            if unknown:
+                raise Exception(f'Loader "{name}" depends on unknown loaders: {unknown}')
+
+        resolved = set()
+        remaining = dict(self.loaders)
+        while remaining:
+            ready = [name for name, loader in remaining.items() if set(loader['depends_on']) <= resolved]
+            if not ready:
+                raise Exception(f'Cyclic dependency between loaders: {sorted(remaining)}')
+
+            for name in ready:
+                resolved.add(name)
+                remaining.pop(name)
+
+    def _run_loader(self, name, func, started_at):
+        stats = self.stats[name]
+        stats['start'] = time.monotonic() - started_at
+        logger.info(f'Loader "{name}" started...')
+
+        func()
+
+        stats['end'] = time.monotonic() - started_at
+        stats['duration'] = stats['end'] - stats['start']
+        logger.info(f'Loader "{name}" finished in {stats["duration"]:.1f}s')
+
+    def _check_timeouts(self, running, started_at):
+        now = time.monotonic() - started_at
+        for name in running.values():
+            timeout = self.loaders[name]['timeout']
+            start = self.stats[name].get('start')
+
+            if timeout is not None and start is not None and now - start > timeout:
+                raise TimeoutError(f'Loader "{name}" did not finish in {timeout}s!')
+
+    def _compute_critical_path(self):
+        """
+        Walks back from the loader which finished last, always following the dependency
+        which finished last. The result is the chain of loaders which determined the
+        total duration of the stage.
+        """
+        if not self.stats:
+            return []
+
+        name = max(self.stats, key=lambda n: self.stats[n]['end'])
+        path = [name]
+        while self.loaders[name]['depends_on']:
+            name = max(self.loaders[name]['depends_on'], key=lambda n: self.stats[n]['end'])
+            path.append(name)
+
+        return path[::-1]
+
+    def _log_report(self, total_duration):
+        for name, stats in sorted(self.stats.items(), key=lambda item: item[1]['start']):
+            logger.info(
+                f'Loader "{name}": start {stats["start"]:.1f}s, '
+                f'end {stats["end"]:.1f}s, '
+                f'duration {stats["duration"]:.1f}s, '
+                f'waited for pool {stats["start"] - stats["ready"]:.1f}s'
+            )
+
+        path_duration = sum(self.stats[name]['duration'] for name in self.critical_path)
+        logger.info(
+            f'Loaders finished in {total_duration:.1f}s, '
+            f'sum of durations {sum(s["duration"] for s in self.stats.values()):.1f}s, '
+            f'critical path ({path_duration:.1f}s): {" -> ".join(self.critical_path)}'
+        )
+
+    def run(self):
+        """
+        Runs all registered loaders.
+
+        Exception raised by any loader (or TimeoutError of a loader running longer than its
+        timeout) is re-raised immediately and loaders which did not start yet are cancelled.
+        Python threads can not be killed, so a loader which timed out keeps running in the
+        background until its blocking call returns.
+
+        Returns:
+            dict: Per loader stats {'ready', 'start', 'end', 'duration'} in seconds from the start of the run.
+        """
+        self._validate()
+        self.stats = {}
+
+        pending = dict(self.loaders)
+        running = {}
+        finished = set()
+        started_at = time.monotonic()
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='loader')
+        try:
+            while pending or running:
+                ready = [name for name, loader in pending.items() if set(loader['depends_on']) <= finished]
+                for name in ready:
+                    loader = pending.pop(name)
+                    self.stats[name] = {'ready': time.monotonic() - started_at}
+                    future = executor.submit(self._run_loader, name, loader['func'], started_at)
+                    running[future] = name
+
+                poll_interval = TIMEOUT_POLL_INTERVAL if any(
+                    self.loaders[name]['timeout'] is not None for name in running.values()
+                ) else None
+                done, _ = wait(running, timeout=poll_interval, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    name = running.pop(future)
+                    future.result()
+                    finished.add(name)
+
+                self._check_timeouts(running, started_at)
+
+        except BaseException:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+        executor.shutdown(wait=True)
+
+        self.critical_path = self._compute_critical_path()
+        self._log_report(time.monotonic() - started_at)
+
+        return self.stats
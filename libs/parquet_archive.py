@@ -0,0 +1,265 @@
+import io
+import os
+import re
+import json
+import logging
+import datetime as dt
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+
+class DailyParquetArchive:
+    """
+    Folder with one Parquet file per day (local or S3) whose closed days are
+    compacted into one file per month.
+
+    Compacted days are listed in `catalog.json` in the folder:
+        {"months": {"202401": {"file": "monthly/202401.parquet", "days": ["20240101", ...], "rows": 123}}}
+    Readers use the monthly file for the days in the catalog and daily files for
+    the rest, so compaction (and removal of compacted daily files) is transparent.
+    Writer of a daily file of an already compacted day (backfill, re-run) has to
+    call `invalidate`, the day is then read from the daily file again and its rows
+    in the monthly file are replaced by the next compaction.
+
+    Example:
+        archive = DailyParquetArchive('s3://autopricing/kickz/rcmnd_history')
+        archive.compact(keep_days=7)
+        df = archive.read(dt.date(2024, 1, 1), dt.date(2024, 3, 31), columns=['style', 'recom_price'])
+    """
+    DAY_FORMAT = '%Y%m%d'
+    MONTH_FORMAT = '%Y%m'
+    CATALOG = 'catalog.json'
+
+    def __init__(self, uri, daily_name='{day}.parquet', monthly_name='monthly/{month}.parquet',
+                 date_column='date', sort_by=('style', 'country_code'), row_group_size=256_000,
+                 compression='zstd'):
+        """
+        Args:
+            uri (str): Folder with daily files, local path or s3://bucket/prefix.
+            daily_name (str): Name of daily file, `{day}` is replaced by YYYYMMDD.
+            monthly_name (str): Name of monthly file, `{month}` is replaced by YYYYMM.
+            date_column (str): Column with date (or datetime) of rows.
+            sort_by (tuple): Rows of monthly files are sorted by these columns (if present).
+            row_group_size (int): Rows per row group of monthly files.
+            compression (str): Codec of monthly files.
+        """
+        self.uri = uri.rstrip('/')
+        self.daily_name = daily_name
+        self.monthly_name = monthly_name
+        self.date_column = date_column
+        self.sort_by = list(sort_by)
+        self.row_group_size = row_group_size
+        self.compression = compression
+
+        self.filesystem, self.root = pafs.FileSystem.from_uri(self.uri if '://' in self.uri else os.path.abspath(self.uri))
+        self._daily_pattern = re.compile('^' + re.escape(daily_name).replace(re.escape('{day}'), r'(\d{8})') + '$')
+
+    def _path(self, name):
+        return f'{self.root}/{name}'
+
+    def daily_file(self, day):
+        return self.daily_name.format(day=day.strftime(self.DAY_FORMAT))
+
+    def monthly_file(self, month):
+        return self.monthly_name.format(month=month)
+
+    def catalog(self):
+        """
+        Returns catalog of compacted months (empty if nothing was compacted yet)
+        """
+        path = self._path(self.CATALOG)
+        if self.filesystem.get_file_info(path).type == pafs.FileType.NotFound:
+            return {'months': {}}
+
+        with self.filesystem.open_input_stream(path) as f:
+            return json.loads(f.read())
+
+    def compacted_days(self, catalog=None):
+        """
+        Returns {day (YYYYMMDD): monthly file}
+        """
+        catalog = catalog or self.catalog()
+        return {
+            day: month['file']
+            for month in catalog['months'].values()
+            for day in month['days']
+        }
+
+    def invalidate(self, days):
+        """
+        Removes days (datetime.date) from the catalog, call it after a daily file
+        of a compacted day was written again.
+
+        Returns:
+            list: Invalidated days (YYYYMMDD).
+        """
+        days = {day.strftime(self.DAY_FORMAT) for day in days}
+        catalog = self.catalog()
+
+        invalidated = []
+        for month in catalog['months'].values():
+            invalidated += [day for day in month['days'] if day in days]
+            month['days'] = [day for day in month['days'] if day not in days]
+
+        if invalidated:
+            self._write_file(self.CATALOG, json.dumps(catalog, indent=2).encode('utf-8'))
+            logger.info(f'{self.uri}: days {invalidated} removed from {self.CATALOG}, daily files are used')
+
+        return invalidated
+
+    def _write_file(self, name, data):
+        # zapis do docasneho suboru => citatelia nikdy nevidia nedopisany subor
+        path = self._path(name)
+        self.filesystem.create_dir(path.rsplit('/', 1)[0], recursive=True)
+        with self.filesystem.open_output_stream(f'{path}.tmp') as f:
+            f.write(data)
+        self.filesystem.move(f'{path}.tmp', path)
+
+    def _read_file(self, name, columns=None, filters=None):
+        return pq.read_table(
+            self._path(name),
+            filesystem=self.filesystem,
+            columns=columns,
+            filters=filters
+        ).to_pandas()
+
+    def _daily_files(self):
+        """
+        Returns {day (YYYYMMDD): file name} of all daily files in the folder
+        """
+        files = {}
+        for info in self.filesystem.get_file_info(pafs.FileSelector(self.root, allow_not_found=True)):
+            match = self._daily_pattern.match(info.base_name)
+            if match and info.type == pafs.FileType.File:
+                files[match.group(1)] = info.base_name
+
+        return files
+
+    def compact(self, keep_days=7, today=None, delete_daily=False):
+        """
+        Merges daily files older than `keep_days` into monthly files.
+
+        Month which is compacted again (new closed days) is rewritten together with
+        the days already in its monthly file. Daily files are removed only after the
+        catalog was updated and only if `delete_daily` is True.
+
+        Returns:
+            list: Compacted months (YYYYMM).
+        """
+        today = today or dt.date.today()
+        last_closed_day = (today - dt.timedelta(days=keep_days)).strftime(self.DAY_FORMAT)
+
+        catalog = self.catalog()
+        compacted = self.compacted_days(catalog)
+
+        months = {}
+        for day, name in sorted(self._daily_files().items()):
+            if day <= last_closed_day and day not in compacted:
+                months.setdefault(day[:6], {})[day] = name
+
+        for month, days in months.items():
+            dataframes = []
+            entry = catalog['months'].get(month)
+            if entry is not None:
+                # bez riadkov invalidovanych dni, tie sa nahradia dennym suborom
+                dataframes.append(self._keep_days(self._read_file(entry['file']), entry['days']))
+
+            for day, name in days.items():
+                logger.info(f'Compacting {self.uri}/{name}...')
+                dataframes.append(self._read_file(name))
+
+            df = pd.concat(dataframes, ignore_index=True)
+            sort_by = [col for col in self.sort_by if col in df.columns]
+            if sort_by:
+                df = df.sort_values(sort_by, kind='stable').reset_index(drop=True)
+
+            buffer = io.BytesIO()
+            pq.write_table(
+                pa.Table.from_pandas(df, preserve_index=False),
+                buffer,
+                compression=self.compression,
+                row_group_size=self.row_group_size
+            )
+            monthly_file = self.monthly_file(month)
+            self._write_file(monthly_file, buffer.getvalue())
+
+            catalog['months'][month] = {
+                'file': monthly_file,
+                'days': sorted(set(entry['days'] if entry else []) | set(days)),
+                'rows': len(df)
+            }
+            self._write_file(self.CATALOG, json.dumps(catalog, indent=2).encode('utf-8'))
+            logger.info(f'{self.uri}/{monthly_file}: {len(days)} days compacted, {len(df)} rows')
+
+            if delete_daily:
+                for name in days.values():
+                    self.filesystem.delete_file(self._path(name))
+
+        return list(months)
+
+    def _keep_days(self, df, days):
+        days = pd.to_datetime(list(days), format=self.DAY_FORMAT)
+        return df[pd.to_datetime(df[self.date_column]).dt.normalize().isin(days)]
+
+    def filter_days(self, df, from_date, to_date, compacted=None):
+        """
+        Keeps rows of monthly file between from_date and to_date (including). If
+        `compacted` (see compacted_days) is given, rows of days which are not in it
+        (invalidated days, read from daily files) are removed too.
+        """
+        days = pd.to_datetime(df[self.date_column]).dt.normalize()
+        mask = (days >= pd.Timestamp(from_date)) & (days <= pd.Timestamp(to_date))
+        if compacted is not None:
+            mask &= days.isin(pd.to_datetime(list(compacted), format=self.DAY_FORMAT))
+
+        return df[mask]
+
+    def plan(self, from_date, to_date, compacted=None):
+        """
+        Returns files to read for the days between from_date and to_date:
+            (list of monthly files, list of daily files)
+        """
+        if compacted is None:
+            compacted = self.compacted_days()
+
+        monthly_files, daily_files = [], []
+        for x in range((to_date - from_date).days + 1):
+            day = from_date + dt.timedelta(days=x)
+            monthly_file = compacted.get(day.strftime(self.DAY_FORMAT))
+
+            if monthly_file is None:
+                daily_files.append(self.daily_file(day))
+            elif monthly_file not in monthly_files:
+                monthly_files.append(monthly_file)
+
+        return monthly_files, daily_files
+
+    def read(self, from_date, to_date, columns=None, filters=None):
+        """
+        Reads rows between from_date and to_date (including), missing days are skipped.
+        """
+        compacted = self.compacted_days()
+        monthly_files, daily_files = self.plan(from_date, to_date, compacted)
+        read_columns = columns
+        if columns is not None and self.date_column not in columns:
+            read_columns = list(columns) + [self.date_column]
+
+        dataframes = []
+        for name in monthly_files:
+            df = self.filter_days(self._read_file(name, read_columns, filters), from_date, to_date, compacted)
+            dataframes.append(df if read_columns is columns else df[columns])
+
+        for name in daily_files:
+            if self.filesystem.get_file_info(self._path(name)).type == pafs.FileType.NotFound:
+                continue
+            dataframes.append(self._read_file(name, columns, filters))
+
+        if not dataframes:
+            raise Exception(f'Data not found in {self.uri} between {from_date} and {to_date}')
+
+        return pd.concat(dataframes, ignore_index=True)
@@ -0,0 +1,218 @@
+import os
+import re
+import time
+import json
+import inspect
+import hashlib
+import logging
+import threading
+from functools import wraps
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+# kluc v metadatach Parquet suboru s fingerprintom zdroja (vid. `cached(probe=...)`)
+FINGERPRINT_KEY = b'query_cache_fingerprint'
+
+
+def normalize_sql(text):
+    """
+    Removes SQL line comments and collapses whitespace, so formatting changes
+    do not change the cache key.
+    """
+    text = re.sub(r'--[^\n]*', ' ', text)
+    return ' '.join(text.split())
+
+
+class QueryCache:
+    """
+    Content-addressed cache of loader results stored as Parquet files on local disk.
+
+    Entry is stored as `{namespace}__{sha256 of key}.parquet`. Age of the entry is
+    the file modification time, last use is the file access time (set explicitly
+    on every hit), so the cache needs no index and can be shared by several
+    processes (cron jobs) running from the same directory. When the total size
+    exceeds `max_bytes`, least recently used entries are removed.
+    """
+
+    def __init__(self, path, max_bytes=2 * 2**30, enabled=True):
+        """
+        Args:
+            path (str): Directory with cached files.
+            max_bytes (int): Maximum total size of cached files.
+            enabled (bool): False => every call goes to the source (global bypass).
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(*parts):
+        payload = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _file_path(self, namespace, key):
+        return os.path.join(self.path, f'{namespace}__{key}.parquet')
+
+    def get(self, namespace, key, ttl, fingerprint=None):
+        """
+        Returns cached DataFrame or None if it is missing or older than ttl seconds.
+
+        Entry older than ttl is still returned (and its age is reset) when `fingerprint`
+        is given and equals the fingerprint stored with the entry.
+        """
+        path = self._file_path(namespace, key)
+        try:
+            modified = os.path.getmtime(path)
+        except OSError:
+            return None
+
+        try:
+            if time.time() - modified > ttl:
+                if fingerprint is None or self.fingerprint(path) != fingerprint:
+                    return None
+                modified = time.time()
+
+            df = pd.read_parquet(path)
+            os.utime(path, (time.time(), modified))
+        except (OSError, ValueError):
+            logger.exception(f'Cached file {path} can not be loaded!')
+            return None
+
+        return df
+
+    @staticmethod
+    def fingerprint(path):
+        metadata = pq.read_schema(path).metadata or {}
+        value = metadata.get(FINGERPRINT_KEY)
+        return value.decode('utf-8') if value is not None else None
+
+    def put(self, namespace, key, df, fingerprint=None):
+        os.makedirs(self.path, exist_ok=True)
+        path = self._file_path(namespace, key)
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if fingerprint is not None:
+            table = table.replace_schema_metadata({
+                **(table.schema.metadata or {}),
+                FINGERPRINT_KEY: fingerprint.encode('utf-8')
+            })
+
+        # unikatny docasny subor, aby sa paralelne zapisy neprepisali
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, path)
+
+        self._evict()
+
+    def invalidate(self, namespace):
+        """
+        Removes all entries of the namespace (e.g. after the source was changed by us).
+        """
+        for file_name, path, _ in self._entries():
+            if file_name.startswith(f'{namespace}__'):
+                self._remove(path)
+
+    def clear(self):
+        for _, path, _ in self._entries():
+            self._remove(path)
+
+    def _entries(self):
+        if not os.path.isdir(self.path):
+            return []
+
+        entries = []
+        for file_name in os.listdir(self.path):
+            if not file_name.endswith('.parquet'):
+                continue
+
+            path = os.path.join(self.path, file_name)
+            try:
+                entries.append((file_name, path, os.stat(path)))
+            except OSError:
+                # odstraneny inym procesom
+                continue
+
+        return entries
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _evict(self):
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda entry: entry[2].st_atime)
+            total_bytes = sum(stat.st_size for _, _, stat in entries)
+
+            for file_name, path, stat in entries:
+                if total_bytes <= self.max_bytes:
+                    break
+
+                logger.info(f'Query cache: evicting {file_name}')
+                self._remove(path)
+                total_bytes -= stat.st_size
+
+
+def cached(cache, ttl, unordered=(), probe=None):
+    """
+    Decorator caching DataFrame returned by the loader in `cache` for `ttl` seconds.
+
+    Key is made from the normalized source of the loader (i.e. its SQL text) and
+    the call arguments, so changed query or different parameters never hit an
+    old entry. Arguments listed in `unordered` (e.g. 'styles') are sorted first.
+    The cache is bypassed by calling the loader with `use_cache=False`.
+
+    `probe` is an optional callable without arguments returning a cheap fingerprint
+    (str) of the source, e.g. result of `SELECT MAX(balance_date)`. It is called only
+    when the entry is older than ttl; if the fingerprint did not change since the entry
+    was stored, the entry is reused instead of running the loader.
+
+    Example:
+        @cached(CACHE, ttl=3600, unordered=('styles',))
+        def get_orders(styles=None, from_date=None, to_date=None):
+            ...
+    """
+    def decorator(func):
+        namespace = func.__qualname__
+        signature = inspect.signature(func)
+        source = normalize_sql(inspect.getsource(func))
+
+        @wraps(func)
+        def wrapper(*args, use_cache=True, **kwargs):
+            if not (use_cache and cache.enabled):
+                return func(*args, **kwargs)
+
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            params = {
+                name: sorted(set(value)) if name in unordered and value is not None else value
+                for name, value in bound.arguments.items()
+            }
+            key = cache.key(source, params)
+
+            df = cache.get(namespace, key, ttl)
+            if df is not None:
+                logger.info(f'Query cache: {namespace} served from cache')
+                return df
+
+            fingerprint = probe() if probe is not None else None
+            if fingerprint is not None:
+                df = cache.get(namespace, key, ttl, fingerprint=fingerprint)
+                if df is not None:
+                    logger.info(f'Query cache: {namespace} source not changed ({fingerprint}), served from cache')
+                    return df
+
+            df = func(*args, **kwargs)
+            cache.put(namespace, key, df, fingerprint=fingerprint)
+
+            return df
+
+        return wrapper
+    return decorator
@@ -1,16 +1,212 @@
-import boto3
-import json
+import os
 import io
+import json
+import shutil
+import hashlib
+import logging
+import threading
+
+import boto3
+from boto3.s3.transfer import TransferConfig, create_transfer_manager
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from s3transfer.subscribers import BaseSubscriber
+
+logger = logging.getLogger(__name__)
+
+
+class _ObjectMeta(BaseSubscriber):
+    """
+    Provides size and ETag of the object to s3transfer, so it does not send its own 
+    HEAD and all ranged GETs are conditional on this ETag (IfMatch)
+    """
+    def __init__(self, size, etag):
+        self.size = size
+        self.etag = etag
+    
+    def on_queued(self, future, **kwargs):
+        future.meta.provide_transfer_size(self.size)
+        future.meta.provide_object_etag(self.etag)
+
+
+class S3DiskCache:
+    """
+    Size-bounded read-through cache of S3 objects on local disk.
+
+    Object is stored as `{sha256 of bucket/key}.bin` with its ETag in `.json` next
+    to it. Cached object is revalidated by conditional GET (If-None-Match), i.e. it
+    is downloaded again only when it changed. Body is streamed into the file, not into 
+    memory, objects larger than S3.TRANSFER_CONFIG.multipart_threshold in parallel parts 
+    pinned to the ETag of the GET. When the total size exceeds `max_bytes`, least recently 
+    used objects are removed (last use is the access time, set on every hit).
+
+    Example:
+        S3.enable_cache('./cache/s3', max_bytes=5 * 2**30)
+        S3.get_file_from_bucket('autopricing', 'kickz/file.json', as_json=True)
+    """
+    def __init__(self, path, max_bytes=5 * 2**30):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _paths(self, bucket_name, file_name):
+        name = hashlib.sha256(f'{bucket_name}/{file_name}'.encode('utf-8')).hexdigest()
+        return os.path.join(self.path, f'{name}.bin'), os.path.join(self.path, f'{name}.json')
+
+    def _cached_etag(self, data_path, meta_path):
+        if not os.path.exists(data_path):
+            return None
+
+        try:
+            with open(meta_path) as f:
+                return json.load(f)['etag']
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def fetch(self, client, bucket_name, file_name, etag=None):
+        """
+        Returns path to the local copy of the object.
+
+        Params:
+            client: boto3 S3 client
+            bucket_name (str): name of bucket
+            file_name (str): path to file
+            etag (str): known current ETag (e.g. from manifest) => no request if the cached copy has it
+        """
+        data_path, meta_path = self._paths(bucket_name, file_name)
+        cached_etag = self._cached_etag(data_path, meta_path)
+
+        if cached_etag is not None and cached_etag == (etag or '').strip('"'):
+            os.utime(data_path)
+            return data_path
+
+        kwargs = {'Bucket': bucket_name, 'Key': file_name}
+        if cached_etag is not None:
+            kwargs['IfNoneMatch'] = f'"{cached_etag}"'
+
+        try:
+            response = client.get_object(**kwargs)
+        except ClientError as e:
+            if cached_etag is not None and e.response['Error']['Code'] in ('304', 'NotModified'):
+                os.utime(data_path)
+                return data_path
+            raise
+
+        os.makedirs(self.path, exist_ok=True)
+        # unikatny docasny subor, aby sa paralelne stahovania neprepisali
+        tmp_path = f'{data_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            if response['ContentLength'] < S3.TRANSFER_CONFIG.multipart_threshold:
+                with response['Body'] as body:
+                    shutil.copyfileobj(body, f, 2**20)
+            else:
+                # velky objekt po castiach paralelne, vsetky casti s IfMatch na ETag z GET
+                response['Body'].close()
+                with create_transfer_manager(client, S3.TRANSFER_CONFIG) as manager:
+                    manager.download(
+                        bucket_name, file_name, f,
+                        subscribers = [_ObjectMeta(response['ContentLength'], response['ETag'])]
+                    ).result()
+        os.replace(tmp_path, data_path)
+
+        tmp_meta_path = f'{meta_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_meta_path, 'w') as f:
+            json.dump({'bucket': bucket_name, 'key': file_name, 'etag': response['ETag'].strip('"')}, f)
+        os.replace(tmp_meta_path, meta_path)
+
+        self._evict(keep=data_path)
+        return data_path
+
+    def _evict(self, keep=None):
+        with self._lock:
+            entries = []
+            for file_name in os.listdir(self.path):
+                path = os.path.join(self.path, file_name)
+                if not file_name.endswith('.bin') or path == keep:
+                    continue
+                try:
+                    entries.append((path, os.stat(path)))
+                except OSError:
+                    continue
+
+            total_bytes = sum(stat.st_size for _, stat in entries)
+            for path, stat in sorted(entries, key=lambda entry: entry[1].st_atime):
+                if total_bytes <= self.max_bytes:
+                    break
+
+                for remove_path in (path, path[:-len('.bin')] + '.json'):
+                    try:
+                        os.remove(remove_path)
+                    except OSError:
+                        pass
+                total_bytes -= stat.st_size
+
 
 class S3:    
+    # disk cache of downloaded objects, None => disabled (see enable_cache)
+    CACHE = None
+    
+    # clients are thread safe => one client per credentials for the whole process
+    MAX_POOL_CONNECTIONS = 32
+    TRANSFER_CONFIG = TransferConfig(
+        multipart_threshold = 16 * 2**20,
+        multipart_chunksize = 16 * 2**20,
+        max_concurrency = 8,
+        use_threads = True
+    )
+    _clients = {}
+    _clients_lock = threading.Lock()
+    
+    @staticmethod
+    def configure(max_pool_connections=None, transfer_config=None):
+        """
+        Changes connection pool size of clients and/or multipart transfer settings,
+        clients created before are dropped from the registry.
+        
+        Params:
+            max_pool_connections (int): max. number of connections of one client 
+                                        (should be >= threads using the client)
+            transfer_config (TransferConfig): multipart threshold, chunk size, concurrency
+        """
+        with S3._clients_lock:
+            if max_pool_connections is not None:
+                S3.MAX_POOL_CONNECTIONS = max_pool_connections
+            if transfer_config is not None:
+                S3.TRANSFER_CONFIG = transfer_config
+            S3._clients = {}
+    
+    @staticmethod
+    def enable_cache(path, max_bytes=5 * 2**30):
+        """
+        Enables local read-through cache for get_file_from_bucket and get_local_file
+        """
+        S3.CACHE = S3DiskCache(path, max_bytes)
+    
+    @staticmethod
+    def disable_cache():
+        S3.CACHE = None
+    
     @staticmethod
     def get_client(credentials=None):
         """
-        Returns S3 client
+        Returns S3 client shared by the whole process (one per credentials)
         """
-        if credentials:
-            return boto3.client('s3', **credentials)
-        return boto3.client('s3')
+        key = json.dumps(credentials or {}, sort_keys=True)
+        
+        client = S3._clients.get(key)
+        if client is None:
+            # vytvaranie klienta (boto3 default session) nie je thread safe
+            with S3._clients_lock:
+                client = S3._clients.get(key)
+                if client is None:
+                    client = boto3.client(
+                        's3', 
+                        config = Config(max_pool_connections=S3.MAX_POOL_CONNECTIONS),
+                        **(credentials or {})
+                    )
+                    S3._clients[key] = client
+        
+        return client
     
     @staticmethod
     def create_bucket(bucket_name, location='eu-west-1',credentials=None):
@@ -87,10 +283,7 @@ class S3:
             file_name (str): path to file 
             initial_json (None or dumped json): json to store
         """
-        filenames = S3.get_all_objects_from_bucket(bucket_name = bucket_name, 
-                                                   prefix = file_name, 
-                                                   only_keys = True)
-        if file_name not in filenames:
+        if not S3.exists(bucket_name, file_name, credentials=credentials):
             if initial_json is None:
                 initial_json = json.dumps({})
             
@@ -106,20 +299,35 @@ class S3:
         Params:
             bucket_name (str): name of bucket where to store file
             file_name (str): path to file
-            file (dumped json or binary): file to store
+            file (dumped json, binary or file-like object): file to store, 
+                file-like objects and large files are uploaded in parallel parts
+            
+        Returns:
+            dict: response with 'ETag' of the stored file
         """
         client = S3.get_client(credentials)
-        response = client.put_object(Bucket = bucket_name,
-                                     Key = file_name,
-                                     Body = file)
+        
+        if isinstance(file, (str, bytes)) and len(file) < S3.TRANSFER_CONFIG.multipart_threshold:
+            response = client.put_object(Bucket = bucket_name,
+                                         Key = file_name,
+                                         Body = file)
+        else:
+            if isinstance(file, (str, bytes)):
+                file = io.BytesIO(file.encode('utf-8') if isinstance(file, str) else file)
+            
+            client.upload_fileobj(file, bucket_name, file_name, Config=S3.TRANSFER_CONFIG)
+            response = client.head_object(Bucket = bucket_name,
+                                          Key = file_name)
         
         if response['ResponseMetadata']['HTTPStatusCode'] != 200:
             raise Exception(response)
         
         print(f'"{file_name}" succcesfully stored in "{bucket_name}" bucket!')
+        
+        return response
     
     @staticmethod
-    def get_file_from_bucket(bucket_name, file_name, as_json=False, credentials=None):
+    def get_file_from_bucket(bucket_name, file_name, as_json=False, fileobj=None, credentials=None):
         """
         Ger file from bucket
         
@@ -127,59 +335,108 @@ class S3:
             bucket_name (str): name of bucket where to store file
             file_name (str): path to file
             as_json (boo): if True => convert response body to json
+            fileobj (file-like object): if given => file is streamed into it (and it is returned)
             
         Returns:
             json or bytes object
         """
         client = S3.get_client(credentials)
-        response = client.get_object(Bucket = bucket_name,
-                                     Key = file_name)
+        stream = io.BytesIO() if fileobj is None or as_json else fileobj
         
-        if response['ResponseMetadata']['HTTPStatusCode'] != 200:
-            raise Exception(response)
-        
-        body = response['Body'].read()
+        if S3.CACHE is not None:
+            with open(S3.CACHE.fetch(client, bucket_name, file_name), 'rb') as f:
+                shutil.copyfileobj(f, stream, 2**20)
+        else:
+            client.download_fileobj(bucket_name, file_name, stream, Config=S3.TRANSFER_CONFIG)
         
         if as_json: 
-            return json.loads(body) 
+            return json.loads(stream.getvalue()) 
         
-        return io.BytesIO(body)
+        if stream.seekable():
+            stream.seek(0)
+        return stream
+    
+    @staticmethod
+    def get_local_file(bucket_name, file_name, etag=None, cache=None, credentials=None):
+        """
+        Returns path to the local copy of file downloaded through the disk cache
+        
+        Params:
+            bucket_name (str): name of bucket
+            file_name (str): path to file
+            etag (str): known current ETag => no request if the cached copy has it
+            cache (S3DiskCache): cache to use instead of S3.CACHE
+        """
+        cache = cache or S3.CACHE
+        if cache is None:
+            raise Exception('S3 cache is not enabled, call S3.enable_cache first!')
+        
+        return cache.fetch(S3.get_client(credentials), bucket_name, file_name, etag)
         
     @staticmethod
-    def get_all_objects_from_bucket(bucket_name, prefix='', only_keys=True, credentials=None):
+    def exists(bucket_name, file_name, credentials=None):
         """
-        Get all object from bucket
+        Returns True if file exists in bucket (HEAD request, no listing)
+        """
+        try:
+            S3.get_client(credentials).head_object(Bucket = bucket_name,
+                                                   Key = file_name)
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+        
+        return True
+    
+    @staticmethod
+    def iter_objects(bucket_name, prefix='', start_after=None, suffix=None, only_keys=True, credentials=None):
+        """
+        Yields objects from bucket page by page (keys are in ascending order), 
+        so caller can stop as soon as it has what it needs
         
         Params:
-            bucket_name (str): name of bucket where to store file
+            bucket_name (str): name of bucket
             prefix (str): file filter
-            only_keys (bool): if True => returns only filenames
+            start_after (str): yields only keys after this one, e.g. f'{prefix}/20240101' 
+                               skips straight to the files from 2024-01-01
+            suffix (str): yields only keys ending with suffix, e.g. '.parquet'
+            only_keys (bool): if True => yields only filenames
             
-        Returns:
-            list with filenames or list with dictionaries containing files info
+        Yields:
+            filenames or dictionaries containing files info
         """
-        client = S3.get_client(credentials)
-
         kwargs = {
             'Bucket': bucket_name,
             'Prefix': prefix,    
         }
+        if start_after is not None:
+            kwargs['StartAfter'] = start_after
         
-        data = []
-        while True:
-            response = client.list_objects_v2(**kwargs)
-            
+        paginator = S3.get_client(credentials).get_paginator('list_objects_v2')
+        for response in paginator.paginate(**kwargs):
             if response['ResponseMetadata']['HTTPStatusCode'] != 200:
                 raise Exception(response)
             
-            if only_keys:
-                data += [c.get('Key') for c in response.get('Contents',[])]
-            else:
-                data += response.get('Contents',[])
-
-            try:
-                kwargs['ContinuationToken'] = response['NextContinuationToken']
-            except KeyError:
-                break
-
-        return data
\ No newline at end of file
+            for obj in response.get('Contents', []):
+                if suffix is not None and not obj['Key'].endswith(suffix):
+                    continue
+                
+                yield obj['Key'] if only_keys else obj
+    
+    @staticmethod
+    def get_all_objects_from_bucket(bucket_name, prefix='', only_keys=True, credentials=None):
+        """
+        Get all object from bucket
+        
+        Params:
+            bucket_name (str): name of bucket where to store file
+            prefix (str): file filter
+            only_keys (bool): if True => returns only filenames
+            
+        Returns:
+            list with filenames or list with dictionaries containing files info
+        """
+        return list(S3.iter_objects(bucket_name = bucket_name, 
+                                    prefix = prefix, 
+                                    only_keys = only_keys, 
+                                    credentials = credentials))
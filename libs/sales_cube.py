@@ -0,0 +1,115 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+class SalesCube:
+    """
+    Sold quantities for the last N days as dense int32 array [style, country, days].
+
+    `cube[s, c, d]` is quantity of style `s` sold in country `c` in the last `d` days
+    (i.e. on dates >= today - d). The last country is 'ALL' (sum of all countries).
+    The cube is built in one pass: quantities are binned by days ago and summed
+    cumulatively along the days axis.
+
+    Example:
+        sales = SalesCube.from_orders(df_orders, today=dt.date.today())
+        sales.sold(sales.style_ids(['000544-bk-01']), sales.country_ids(['DE']), 30)    # sold in DE in the last 30 days
+    """
+    ALL = 'ALL'
+
+    def __init__(self, styles, country_codes, cube):
+        """
+        Args:
+            styles (array-like): Styles of the first axis.
+            country_codes (array-like): Countries of the second axis (without 'ALL').
+            cube (numpy.ndarray): int32 array [len(styles), len(country_codes) + 1, max_last_x_days + 1].
+        """
+        self.styles = pd.Index(styles)
+        self.country_codes = pd.Index(list(country_codes) + [self.ALL])
+        self.cube = cube
+        self.max_last_x_days = cube.shape[2] - 1
+
+    @classmethod
+    def from_orders(cls, df_orders, today, max_last_x_days=None):
+        """
+        Args:
+            df_orders (pandas.DataFrame): Orders with date, style, country_code, quantity.
+            today (datetime.date): Day with days ago = 0 (orders after today are counted as today).
+            max_last_x_days (int): Longest window, default is the number of days between
+                                   the first and the last order. Older orders are not counted.
+        """
+        dates = pd.to_datetime(df_orders['date'])
+
+        if max_last_x_days is None:
+            max_last_x_days = (dates.max() - dates.min()).days
+            if pd.isna(max_last_x_days):
+                max_last_x_days = 0
+
+        style_ids, styles = pd.factorize(np.asarray(df_orders['style'], dtype=object))
+        country_ids, country_codes = pd.factorize(np.asarray(df_orders['country_code'], dtype=object))
+        days_ago = (pd.Timestamp(today) - dates.dt.normalize()).dt.days
+        has_date = days_ago.notna().to_numpy()
+        days_ago = np.clip(days_ago.fillna(0).to_numpy(dtype=np.int64), 0, None)
+
+        mask = (style_ids >= 0) & (country_ids >= 0) & has_date & (days_ago <= max_last_x_days)
+        n_countries = len(country_codes) + 1
+        n_days = max_last_x_days + 1
+
+        # jeden bincount namiesto groupby pre kazdy den
+        flat_index = (style_ids[mask] * n_countries + country_ids[mask]) * n_days + days_ago[mask]
+        unique_index, inverse = np.unique(flat_index, return_inverse=True)
+        quantities = np.bincount(inverse, weights=df_orders['quantity'].to_numpy(dtype=float)[mask])
+
+        bins = np.zeros(len(styles) * n_countries * n_days, dtype=np.int32)
+        bins[unique_index] = np.rint(quantities)
+        bins = bins.reshape(len(styles), n_countries, n_days)
+
+        bins[:, -1, :] = bins[:, :-1, :].sum(axis=1)
+        cube = np.cumsum(bins, axis=2, dtype=np.int32)
+
+        logger.info(f'Sales cube {cube.shape}: {cube.nbytes / 2**20:.0f} MB')
+        return cls(styles, country_codes, cube)
+
+    def style_ids(self, styles):
+        """
+        Positions of styles in the cube (-1 for styles without orders)
+        """
+        return self.styles.get_indexer(np.asarray(styles, dtype=object))
+
+    def country_ids(self, country_codes):
+        """
+        Positions of countries in the cube ('ALL' included, -1 for countries without orders)
+        """
+        return self.country_codes.get_indexer(np.asarray(country_codes, dtype=object))
+
+    def sold(self, style_ids, country_ids, windows):
+        """
+        Returns sold items for all rows at once, arguments are broadcast against each other.
+
+        Args:
+            style_ids (array-like): Positions from `style_ids` (-1 => 0 sold items).
+            country_ids (array-like): Positions from `country_ids` (-1 => 0 sold items).
+            windows (array-like): Last x days. None or window longer than max_last_x_days
+                                  => the whole period, NaN or negative window => 0.
+
+        Returns:
+            numpy.ndarray (int32)
+        """
+        windows = np.array(windows, dtype=object)
+        windows = np.where(np.equal(windows, None), self.max_last_x_days, windows).astype(float)
+
+        style_ids, country_ids, windows = np.broadcast_arrays(
+            np.asarray(style_ids), np.asarray(country_ids), windows
+        )
+        valid = (style_ids >= 0) & (country_ids >= 0) & (windows >= 0)
+        if self.cube.shape[0] == 0 or not valid.any():
+            return np.zeros(valid.shape, dtype=np.int32)
+
+        windows = np.minimum(np.where(valid, windows, 0), self.max_last_x_days).astype(np.int64)
+        values = self.cube[np.where(valid, style_ids, 0), np.where(valid, country_ids, 0), windows]
+
+        return np.where(valid, values, 0).astype(np.int32)
@@ -0,0 +1,292 @@
+import time
+import queue
+import logging
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import psutil
+import pyodbc
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionPool:
+    """
+    Small thread-safe pool of pyodbc connections.
+
+    Connections are opened lazily, returned to the pool after use and reused by
+    the next caller (also from another thread), so TLS handshake and login are
+    paid only once per connection. A connection which was idle longer than
+    `health_check_interval` is checked with `SELECT 1` before it is handed out
+    and replaced when it is dead. A connection on which a pyodbc.Error occurred
+    is closed instead of returned to the pool.
+
+    Example:
+        pool = ConnectionPool(CONNECTION_STRING, max_size=4)
+        with pool.connection() as con:
+            df = pd.read_sql(SQL, con)
+    """
+
+    def __init__(self, connection_string, max_size=4, health_check_interval=60, acquire_timeout=None):
+        """
+        Args:
+            connection_string (str): pyodbc connection string.
+            max_size (int): Maximum number of open connections.
+            health_check_interval (float): Idle time in seconds after which connection is checked before use.
+            acquire_timeout (float | None): Maximum time in seconds to wait for a free connection.
+        """
+        self.connection_string = connection_string
+        self.max_size = max_size
+        self.health_check_interval = health_check_interval
+        self.acquire_timeout = acquire_timeout
+
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._stats = {}
+
+    def _connect(self):
+        start = time.monotonic()
+        con = pyodbc.connect(self.connection_string)
+        connect_seconds = time.monotonic() - start
+
+        with self._lock:
+            self._next_id += 1
+            con_id = self._next_id
+            self._stats[con_id] = {
+                'opened_at': time.time(),
+                'closed_at': None,
+                'connect_seconds': connect_seconds,
+                'checkouts': 0,
+                'busy_seconds': 0.0,
+                'health_checks': 0,
+                'errors': 0,
+            }
+
+        logger.info(f'SQL connection #{con_id} opened in {connect_seconds:.2f}s')
+        return {'id': con_id, 'con': con, 'last_used': time.monotonic()}
+
+    def _close(self, item):
+        try:
+            item['con'].close()
+        except pyodbc.Error:
+            pass
+
+        with self._lock:
+            self._stats[item['id']]['closed_at'] = time.time()
+
+    def _is_alive(self, item):
+        with self._lock:
+            self._stats[item['id']]['health_checks'] += 1
+
+        try:
+            cursor = item['con'].cursor()
+            cursor.execute('SELECT 1').fetchall()
+            cursor.close()
+            return True
+        except pyodbc.Error:
+            logger.warning(f'SQL connection #{item["id"]} is dead, reconnecting...')
+            return False
+
+    def _acquire(self):
+        while True:
+            try:
+                item = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+
+            idle_seconds = time.monotonic() - item['last_used']
+            if idle_seconds < self.health_check_interval or self._is_alive(item):
+                return item
+
+            self._close(item)
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager returning a pyodbc connection from the pool.
+
+        Uncommitted transaction is rolled back when the connection is returned.
+        """
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise TimeoutError(f'No free SQL connection in {self.acquire_timeout}s!')
+
+        try:
+            item = self._acquire()
+            start = time.monotonic()
+            broken = False
+            try:
+                yield item['con']
+            except pyodbc.Error:
+                broken = True
+                raise
+            finally:
+                if not broken:
+                    try:
+                        item['con'].rollback()
+                    except pyodbc.Error:
+                        broken = True
+
+                with self._lock:
+                    stats = self._stats[item['id']]
+                    stats['checkouts'] += 1
+                    stats['busy_seconds'] += time.monotonic() - start
+                    stats['errors'] += int(broken)
+
+                if broken:
+                    self._close(item)
+                else:
+                    item['last_used'] = time.monotonic()
+                    self._idle.put(item)
+        finally:
+            self._slots.release()
+
+    def stats(self):
+        """
+        Returns:
+            dict: Per connection stats {connection_id: {'opened_at', 'closed_at', 'connect_seconds',
+                  'checkouts', 'busy_seconds', 'health_checks', 'errors'}}
+        """
+        with self._lock:
+            return {con_id: dict(stats) for con_id, stats in self._stats.items()}
+
+    def log_stats(self):
+        for con_id, stats in self.stats().items():
+            logger.info(
+                f'SQL connection #{con_id}: connect {stats["connect_seconds"]:.2f}s, '
+                f'{stats["checkouts"]} checkouts, busy {stats["busy_seconds"]:.1f}s, '
+                f'{stats["health_checks"]} health checks, {stats["errors"]} errors'
+                f'{", closed" if stats["closed_at"] else ""}'
+            )
+
+    def close_all(self):
+        """
+        Closes all idle connections.
+        """
+        while True:
+            try:
+                item = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._close(item)
+
+
+def _column_to_array(values, dtype, categories):
+    """
+    Converts one column of a fetched batch (tuple of python values) to numpy array.
+    Categorical columns are encoded to int32 codes using (and extending) `categories`.
+    """
+    if dtype == 'category':
+        return np.fromiter(
+            (-1 if value is None else categories.setdefault(value, len(categories)) for value in values),
+            dtype=np.int32,
+            count=len(values)
+        )
+
+    if dtype == 'str':
+        return np.array(values, dtype=object)
+
+    # integer stlpce sa citaju ako float64 (None -> NaN, Decimal bez orezania),
+    # na integer sa prevedu az po nacitani vsetkych batchov (vid. integer_column)
+    if np.dtype(dtype).kind in 'iu':
+        return np.array(values, dtype=np.float64)
+
+    return np.array(values, dtype=dtype)
+
+
+def integer_column(array, dtype, column):
+    """
+    Converts float64 array of integer column to `dtype`. Column with NULLs,
+    non-integral values (e.g. SUM of decimals) or values out of the range of
+    `dtype` stays float64 (like in pd.read_sql).
+    """
+    info = np.iinfo(dtype)
+    finite = np.isfinite(array)
+
+    if not finite.all():
+        reason = f'{np.count_nonzero(~finite)} NULL values'
+    elif not np.array_equal(array, np.trunc(array)):
+        reason = 'non-integral values'
+    elif array.size and (array.min() < info.min or array.max() > info.max):
+        reason = f'values out of {dtype} range'
+    else:
+        return array.astype(dtype)
+
+    logger.warning(f'Column {column} has {reason}, it is read as float64 instead of {dtype}')
+    return array
+
+
+def read_sql_columnar(con, sql, schema, params=None, batch_size=50_000, name=None):
+    """
+    Executes query and reads the result with cursor.fetchmany straight into typed
+    column arrays, without building object DataFrame from all rows like pd.read_sql.
+
+    Args:
+        con: pyodbc connection.
+        sql (str): SQL query.
+        schema (dict): Column name -> dtype. Supported dtypes:
+            - 'datetime64[ns]' (dates and datetimes, None -> NaT)
+            - numpy numeric dtypes, e.g. 'int32', 'float64' (integer column with NULL or
+              non-integral values is returned as float64, see integer_column)
+            - 'category' (strings with few distinct values)
+            - 'str' (python strings in object column)
+            Columns not present in schema are read as 'str'.
+        params (tuple | None): Query parameters.
+        batch_size (int): Number of rows fetched at once.
+        name (str | None): Name used in the log (e.g. loader name).
+
+    Returns:
+        pd.DataFrame
+    """
+    process = psutil.Process()
+    start = time.monotonic()
+    peak_rss = process.memory_info().rss
+
+    cursor = con.cursor()
+    cursor.execute(sql, params) if params else cursor.execute(sql)
+
+    columns = [description[0] for description in cursor.description]
+    dtypes = [schema.get(column, 'str') for column in columns]
+    chunks = [[] for _ in columns]
+    categories = [{} for _ in columns]
+
+    rows = 0
+    while True:
+        batch = cursor.fetchmany(batch_size)
+        if not batch:
+            break
+
+        rows += len(batch)
+        for i, values in enumerate(zip(*batch)):
+            chunks[i].append(_column_to_array(values, dtypes[i], categories[i]))
+
+        del batch
+        peak_rss = max(peak_rss, process.memory_info().rss)
+
+    cursor.close()
+
+    data = {}
+    for column, dtype, column_chunks, column_categories in zip(columns, dtypes, chunks, categories):
+        if column_chunks:
+            array = np.concatenate(column_chunks)
+        else:
+            array = _column_to_array((), dtype, column_categories)
+
+        if dtype == 'category':
+            array = pd.Categorical.from_codes(array, categories=list(column_categories))
+        elif np.dtype(dtype).kind in 'iu':
+            array = integer_column(array, dtype, column)
+
+        data[column] = array
+
+    df = pd.DataFrame(data, columns=columns)
+
+    logger.info(
+        f'{name or "Query"}: {rows} rows in {time.monotonic() - start:.1f}s, '
+        f'peak RSS {peak_rss / 2**20:.0f} MB'
+    )
+
+    return df
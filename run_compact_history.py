@@ -0,0 +1,47 @@
+import logging
+import sentry_sdk
+from sentry_sdk.integrations.logging import LoggingIntegration
+from client_based_code.kickz_code import S3RcmndHistory, recommendations_backup_archive
+from settings import kickz
+from libs.logger import Logger
+
+# At 04:00 on Sunday (pricing nebezi)
+"""
+CRON: 0 4 * * 0 cd /home/ec2-user/autopricing-kickz/ && /home/ec2-user/anaconda3/bin/python run_compact_history.py
+"""
+
+# SENTRY settings
+sentry_logging = LoggingIntegration(
+    level = logging.INFO,        
+    event_level = logging.ERROR 
+)
+sentry_sdk.init(
+    dsn = kickz.sentry_dsn,
+    integrations = [sentry_logging]
+)
+
+# logging
+logger = Logger().get_full_logger(
+    filename = './logs/compact_history.log',
+    log_level = logging.INFO,
+    print_level = logging.INFO)
+
+def run():
+    archives = {
+        'rcmnd_history': S3RcmndHistory.archive(),
+        'backup': recommendations_backup_archive()
+    }
+    
+    for name, archive in archives.items():
+        try:
+            months = archive.compact(
+                keep_days = kickz.compaction_keep_days,
+                delete_daily = kickz.compaction_delete_daily
+            )
+            logger.info(f'{name}: compacted months {months}')
+            
+        except Exception as e:
+            logger.exception(f'{name}: exception occured')
+
+if __name__ == '__main__':
+    run()
@@ -15,10 +15,22 @@ countries = [
 ]
 
 
+# Data loading
+loaders_max_workers = 6
+loaders_timeout = 60 * 60 # seconds
+
+# Compaction of daily history files (run_compact_history.py)
+compaction_keep_days = 7 # younger days stay as daily files
+compaction_delete_daily = False
+
+# FX rates (ECB)
+fx_rates_path = './data/fx_rates.parquet'
+
 # Google Sheets
 gs_path_token = './auth_files/token.pickle'
 gs_path_client_secret = './auth_files/client_secret_708086849726-edgo6g4pigkf5rj0qc52rir18oso0kto.apps.googleusercontent.com.json'
 gs_spreadsheet_id = '1PHzUwQEZ5gLmf32D3Akx_qL5iFta8HuCnZWtWVb3bTk'
+gs_snapshot_dir = './cache/google_sheets'
 
 # Sentry
 sentry_dsn = 'https://d4861196a0bac78660f394c1bc225891@o504927.ingest.us.sentry.io/4509962027597824'
@@ -0,0 +1,89 @@
+import pandas as pd
+import pytest
+
+pytest.importorskip('google.cloud.bigquery')
+
+from libs import bq as bq_module
+from libs.bq import BigQuery, LocalBigQueryClient
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({
+        'country_code': ['DE', 'AT', 'DE', 'CH', 'DE'],
+        'competitor_shop_name': ['a', 'b', 'a', 'c', 'b'],
+        'price': [10.0, 20.0, 30.0, 40.0, 50.0],
+    })
+
+
+class _RestOnlyRows:
+    def __init__(self, df):
+        self.df = df
+
+    def to_arrow_iterable(self, bqstorage_client=None):
+        raise AssertionError('Storage Read API must not be used')
+
+    def to_dataframe(self):
+        return self.df
+
+
+class _RestOnlyClient:
+    def __init__(self, df):
+        self.df = df
+
+    def query(self, sql):
+        return self
+
+    def result(self):
+        return _RestOnlyRows(self.df)
+
+
+def test_arrow_path(df):
+    client = LocalBigQueryClient(df, batch_size=2)
+    bq = BigQuery.from_client(client, bqstorage_client=client)
+
+    result = bq.get_data_from_query('SELECT 1', use_bqstorage=True, dtypes={'country_code': 'category'})
+
+    pd.testing.assert_frame_equal(result.astype({'country_code': str}), df, check_dtype=False)
+    assert isinstance(result['country_code'].dtype, pd.CategoricalDtype)
+    assert client.queries == ['SELECT 1']
+
+
+def test_arrow_path_empty_result(df):
+    client = LocalBigQueryClient(df.iloc[:0])
+    bq = BigQuery.from_client(client, bqstorage_client=client)
+
+    result = bq.get_data_from_query('SELECT 1', use_bqstorage=True)
+
+    assert result.empty
+    assert list(result.columns) == list(df.columns)
+
+
+def test_rest_path_is_the_same(df):
+    client = LocalBigQueryClient(df, batch_size=2)
+    dtypes = {'country_code': 'category', 'competitor_shop_name': 'category'}
+
+    arrow = BigQuery.from_client(client, bqstorage_client=client).get_data_from_query('SELECT 1', use_bqstorage=True, dtypes=dtypes)
+    rest = BigQuery.from_client(client).get_data_from_query('SELECT 1', dtypes=dtypes)
+
+    # categories are in order of appearance in Arrow, sorted by astype
+    pd.testing.assert_frame_equal(arrow, rest, check_categorical=False)
+
+
+def test_falls_back_to_rest_without_storage_library(df, monkeypatch):
+    monkeypatch.setattr(bq_module, 'bigquery_storage', None)
+    bq = BigQuery.from_client(_RestOnlyClient(df))
+
+    pd.testing.assert_frame_equal(bq.get_data_from_query('SELECT 1', use_bqstorage=True), df)
+
+
+def test_falls_back_to_rest_if_storage_client_fails(df, monkeypatch):
+    class BrokenStorage:
+        @staticmethod
+        def BigQueryReadClient(credentials=None):
+            raise RuntimeError('no credentials')
+
+    monkeypatch.setattr(bq_module, 'bigquery_storage', BrokenStorage)
+    bq = BigQuery.from_client(_RestOnlyClient(df))
+
+    pd.testing.assert_frame_equal(bq.get_data_from_query('SELECT 1', use_bqstorage=True), df)
@@ -0,0 +1,107 @@
+import os
+
+import pytest
+
+boto3 = pytest.importorskip('boto3')
+moto = pytest.importorskip('moto')
+
+from libs.s3 import S3, S3DiskCache
+
+
+BUCKET = 'autopricing'
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'eu-west-1')
+
+    with moto.mock_aws():
+        S3.configure()
+        client = S3.get_client()
+        client.create_bucket(Bucket=BUCKET, CreateBucketConfiguration={'LocationConstraint': 'eu-west-1'})
+        yield client
+        S3.configure()
+
+
+def test_fetch_downloads_and_revalidates(client, tmp_path):
+    cache = S3DiskCache(str(tmp_path), max_bytes=2**20)
+    client.put_object(Bucket=BUCKET, Key='kickz/a.json', Body=b'{"a": 1}')
+
+    path = cache.fetch(client, BUCKET, 'kickz/a.json')
+    with open(path, 'rb') as f:
+        assert f.read() == b'{"a": 1}'
+
+    # nezmeneny objekt => ta ista lokalna kopia
+    assert cache.fetch(client, BUCKET, 'kickz/a.json') == path
+
+    client.put_object(Bucket=BUCKET, Key='kickz/a.json', Body=b'{"a": 2}')
+    with open(cache.fetch(client, BUCKET, 'kickz/a.json'), 'rb') as f:
+        assert f.read() == b'{"a": 2}'
+
+
+def test_fetch_multipart(client, tmp_path):
+    cache = S3DiskCache(str(tmp_path), max_bytes=2**30)
+    body = os.urandom(S3.TRANSFER_CONFIG.multipart_threshold + 2**20)
+    client.put_object(Bucket=BUCKET, Key='kickz/big.parquet', Body=body)
+
+    with open(cache.fetch(client, BUCKET, 'kickz/big.parquet'), 'rb') as f:
+        assert f.read() == body
+
+
+def test_get_file_from_bucket_through_cache(client, tmp_path):
+    S3.enable_cache(str(tmp_path))
+    try:
+        S3.store_file_in_bucket(BUCKET, 'kickz/b.json', '{"b": 1}')
+        assert S3.get_file_from_bucket(BUCKET, 'kickz/b.json', as_json=True) == {'b': 1}
+        assert S3.get_file_from_bucket(BUCKET, 'kickz/b.json', as_json=True) == {'b': 1}
+    finally:
+        S3.disable_cache()
+
+
+def test_evict_keeps_fetched_file(client, tmp_path):
+    cache = S3DiskCache(str(tmp_path), max_bytes=10)
+    client.put_object(Bucket=BUCKET, Key='kickz/c.bin', Body=b'x' * 100)
+    client.put_object(Bucket=BUCKET, Key='kickz/d.bin', Body=b'y' * 100)
+
+    first = cache.fetch(client, BUCKET, 'kickz/c.bin')
+    second = cache.fetch(client, BUCKET, 'kickz/d.bin')
+
+    assert not os.path.exists(first)
+    assert os.path.exists(second)
+
+
+def _count_requests(client):
+    calls = []
+    client.meta.events.register(
+        'before-call.s3.*',
+        lambda model, params, **kwargs: calls.append((model.name, params.get('headers', {})))
+    )
+    return calls
+
+
+def test_fetch_is_one_conditional_get(client, tmp_path):
+    cache = S3DiskCache(str(tmp_path), max_bytes=2**20)
+    client.put_object(Bucket=BUCKET, Key='kickz/e.json', Body=b'{"e": 1}')
+    calls = _count_requests(client)
+
+    cache.fetch(client, BUCKET, 'kickz/e.json')
+    cache.fetch(client, BUCKET, 'kickz/e.json')
+
+    assert [name for name, _ in calls] == ['GetObject', 'GetObject']
+    assert 'If-None-Match' in calls[1][1]
+
+
+def test_fetch_multipart_pinned_to_etag_of_get(client, tmp_path):
+    cache = S3DiskCache(str(tmp_path), max_bytes=2**30)
+    body = os.urandom(S3.TRANSFER_CONFIG.multipart_threshold + 2**20)
+    etag = client.put_object(Bucket=BUCKET, Key='kickz/big2.parquet', Body=body)['ETag']
+    calls = _count_requests(client)
+
+    cache.fetch(client, BUCKET, 'kickz/big2.parquet')
+
+    names = [name for name, _ in calls]
+    assert 'HeadObject' not in names
+    assert all(headers.get('If-Match') == etag for _, headers in calls[1:])
+    assert len(calls) > 2
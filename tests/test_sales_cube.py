@@ -0,0 +1,109 @@
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from libs.sales_cube import SalesCube
+
+
+TODAY = dt.date(2024, 3, 31)
+
+
+def _old_sold_items_history(df_orders, today):
+    """
+    PricingLogic._compute_sold_items before SalesCube (groupby for every day)
+    """
+    max_last_x_days = (df_orders['date'].max() - df_orders['date'].min()).days
+    if np.isnan(max_last_x_days):
+        max_last_x_days = 0
+
+    sold_items_history = []
+    for days in range(0, max_last_x_days + 1):
+        from_date = today - dt.timedelta(days=days)
+        df_orders_days = df_orders[df_orders['date'] >= pd.Timestamp(from_date)]
+
+        df_orders_grouped = df_orders_days.groupby(['style','country_code'], observed=True)[['quantity']].sum()
+        df_orders_grouped['last_x_days'] = days
+
+        sold_items_history.append(df_orders_grouped)
+
+    sold_items_history_countries = pd.concat(sold_items_history).reset_index()
+
+    if sold_items_history_countries.empty:
+        return max_last_x_days, pd.DataFrame()
+
+    sold_items_history_total = sold_items_history_countries.groupby(['style','last_x_days'],
+                                                                    as_index=False,
+                                                                    observed=True)[['quantity']].sum()
+    sold_items_history_total['country_code'] = 'ALL'
+
+    return max_last_x_days, pd.concat([sold_items_history_countries, sold_items_history_total])\
+                              .set_index(['style','country_code','last_x_days'])
+
+
+def _old_get_sold_items(history, max_last_x_days, styles, country_codes, last_x_days):
+    """
+    PricingLogic._get_sold_items before SalesCube
+    """
+    if last_x_days is None or last_x_days > max_last_x_days:
+        last_x_days = max_last_x_days
+
+    sold_items = 0
+    for style in styles:
+        for country_code in country_codes:
+            try:
+                sold_items += history.at[(style, country_code, last_x_days), 'quantity']
+            except:
+                pass
+
+    return sold_items
+
+
+def _random_orders(seed, n=2_000, future_days=3):
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp(TODAY) - pd.to_timedelta(rng.integers(-future_days, 60, n), unit='D') \
+            + pd.to_timedelta(rng.integers(0, 24 * 60, n), unit='min')
+    dates = pd.Series(dates).mask(rng.random(n) < 0.02)    # NaT
+
+    return pd.DataFrame({
+        'date': dates,
+        'style': rng.choice([f'{i:06d}-bk-01' for i in range(40)], n),
+        'country_code': pd.Categorical(rng.choice(['DE', 'AT', 'CH', 'NL'], n)),
+        'quantity': rng.integers(1, 4, n),
+    })
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_sold_matches_old_loop(seed):
+    df_orders = _random_orders(seed)
+    max_last_x_days, history = _old_sold_items_history(df_orders, TODAY)
+    sales = SalesCube.from_orders(df_orders, today=TODAY, max_last_x_days=max_last_x_days)
+
+    styles = list(df_orders['style'].unique()) + ['unknown-style']
+    country_codes = ['DE', 'AT', 'CH', 'NL', 'ALL', 'XX']
+    windows = [None, np.nan, -1, 0, 1, 7, 14, 30, max_last_x_days, max_last_x_days + 10]
+
+    for country_code in country_codes:
+        for window in windows:
+            expected = [
+                _old_get_sold_items(history, max_last_x_days, [style], [country_code], window)
+                for style in styles
+            ]
+            result = sales.sold(sales.style_ids(styles), sales.country_ids([country_code]), [window])
+
+            assert result.tolist() == expected, (country_code, window)
+
+
+def test_default_max_last_x_days_matches_old_loop():
+    df_orders = _random_orders(3)
+    max_last_x_days, _ = _old_sold_items_history(df_orders, TODAY)
+
+    assert SalesCube.from_orders(df_orders, today=TODAY).max_last_x_days == max_last_x_days
+
+
+def test_no_orders():
+    df_orders = _random_orders(4).iloc[:0]
+    sales = SalesCube.from_orders(df_orders, today=TODAY)
+
+    assert sales.sold(sales.style_ids(['000001-bk-01']), sales.country_ids(['ALL']), [None, 0, 7]).tolist() == [0, 0, 0]
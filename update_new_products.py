@@ -10,13 +10,21 @@ from libs.help_functions import excel_col_index_to_string
 from client_based_code.kickz_code import (
     S3ProductsToScore,
     get_quantities_from_inventory, 
-    get_live_styles, 
-    get_all_products
+    ProductCatalogue
 )
 
 logger = logging.getLogger(__name__)
 
 class NewProductsAdder:
+    # konfiguracne taby z Google Sheetu
+    GOOGLE_SHEETS_TABS = [
+        'wait_after_release',
+        'remove_from_new_products',
+        'category_settings',
+        'master_remove',
+        'master_remove_brands',
+    ]
+    
     def __init__(self, settings):
         self.settings = settings
         self.gapi = self._initialize_gapi()
@@ -27,7 +35,8 @@ class NewProductsAdder:
         """
         return GoogleSheetsApi(
             path_token = self.settings.gs_path_token,
-            path_client_secret = self.settings.gs_path_client_secret
+            path_client_secret = self.settings.gs_path_client_secret,
+            snapshot_dir = self.settings.gs_snapshot_dir
         )
     
     def _load_products_to_score(self):
@@ -37,14 +46,34 @@ class NewProductsAdder:
         logger.info('Loading products_to_score...')
         return S3ProductsToScore.load_latest().drop_duplicates()
     
-    def _load_wait_after_release_settings(self):
+    def _load_google_sheets(self):
+        """
+        Nacita vsetky konfiguracne taby jednym batchGet volanim
+        (alebo z lokalneho snapshotu ak sa sheet nezmenil)
+        struktura: {'tab_name': DataFrame alebo None}
+        """
+        logger.info('Loading google sheets...')
+        
+        def compile_sheets():
+            tabs = self.gapi.get_tabs_names(self.settings.gs_spreadsheet_id)
+            tabs_to_load = [tab for tab in tabs if tab in self.GOOGLE_SHEETS_TABS]
+            
+            return self.gapi.google_sheets2dfs(self.settings.gs_spreadsheet_id, tabs_to_load), tabs_to_load
+        
+        return self.gapi.load_snapshot(
+            sample_spredsheet_id = self.settings.gs_spreadsheet_id,
+            snapshot_name = 'new_products_adder',
+            compile_func = compile_sheets
+        )
+    
+    def _load_wait_after_release_settings(self, sheets):
         """
         Nacita product_to_score_settings z google sheet
         """
         logger.info('Loading wait_after_relase...')
         wait_after_release_setting = {}
 
-        df_wait_after_release = self.gapi.google_sheet2df(self.settings.gs_spreadsheet_id, 'wait_after_release')
+        df_wait_after_release = sheets.get('wait_after_release')
         if df_wait_after_release is not None:
             df_wait_after_release['style'] = df_wait_after_release['style'].str.lower().str.strip()
             df_wait_after_release['wait_after_release'] = df_wait_after_release['wait_after_release'].astype(int, errors='ignore')
@@ -59,14 +88,14 @@ class NewProductsAdder:
 
         return wait_after_release_setting
     
-    def _load_remove_from_new_products(self):
+    def _load_remove_from_new_products(self, sheets):
         """
         Nacita znacky, produkty, styly ktore nezahrnut v novych produktoch
         """
         logger.info('Loading remove_from_new_products...')
         # ak su nejake produkty ktore je zakazane pridavat
         try:
-            return self.gapi.google_sheet2df(self.settings.gs_spreadsheet_id, 'remove_from_new_products')\
+            return sheets.get('remove_from_new_products')\
                             .drop_duplicates()\
                             .applymap(lambda s: s.strip().lower() if type(s) == str else s)
         except:
@@ -82,7 +111,7 @@ class NewProductsAdder:
     
         return get_quantities_from_inventory(as_dict=True)
     
-    def _load_category_mapper(self):
+    def _load_category_mapper(self, sheets):
         """
         Nacita styly pre jednotlive kategorie
         
@@ -90,7 +119,7 @@ class NewProductsAdder:
         """
         logger.info('Loading category_settings...')
         mapper = {}
-        df_category_settings = self.gapi.google_sheet2df(self.settings.gs_spreadsheet_id, 'category_settings')
+        df_category_settings = sheets.get('category_settings')
         
         if df_category_settings is not None:
             for category in df_category_settings.columns.tolist():
@@ -100,13 +129,13 @@ class NewProductsAdder:
             
         return mapper
     
-    def _load_master_switch_styles_settings(self):
+    def _load_master_switch_styles_settings(self, sheets):
         """
         Nacita master_remove tab so stylmi
         
         struktura: {'DE': ["styl_1", "styl_2",...], 'CZ': []}
         """
-        df_master_remove = self.gapi.google_sheet2df(self.settings.gs_spreadsheet_id, 'master_remove')
+        df_master_remove = sheets.get('master_remove')
         master_switch_styles_settings = {}
         if df_master_remove is not None:
             df_master_remove.columns = [col.strip() for col in df_master_remove.columns]
@@ -116,13 +145,13 @@ class NewProductsAdder:
             
         return master_switch_styles_settings
     
-    def _load_master_switch_brands_settings(self):
+    def _load_master_switch_brands_settings(self, sheets):
         """
         Nacita master_remove_brans tab so znackami
         
         struktura: {'DE': ["styl_1", "styl_2",...], 'CZ': []}
         """
-        df_master_remove = self.gapi.google_sheet2df(self.settings.gs_spreadsheet_id, 'master_remove_brands')
+        df_master_remove = sheets.get('master_remove_brands')
         master_switch_brands_settings = {}
         if df_master_remove is not None:
             df_master_remove.columns = [col.strip() for col in df_master_remove.columns]
@@ -152,7 +181,7 @@ class NewProductsAdder:
         """
         logger.info('Loading all_products...')
         
-        return get_all_products()
+        return ProductCatalogue.load().products()
         
     def _create_category(self, df, quantities_in_inventory):
         """
@@ -172,8 +201,8 @@ class NewProductsAdder:
         df['date_added'] = pd.to_datetime(dt.date.today())
         return df
     
-    def _get_ignored_pruducts_styles(self):
-        df_remove_from_new_products = self._load_remove_from_new_products()
+    def _get_ignored_pruducts_styles(self, sheets):
+        df_remove_from_new_products = self._load_remove_from_new_products(sheets)
         
         if df_remove_from_new_products is None:
             remove_product_name = []
@@ -214,12 +243,13 @@ class NewProductsAdder:
         # nacitanie dat
         df_products_to_score = self._load_products_to_score()
         df_all_products = self._load_all_products()    
+        sheets = self._load_google_sheets()
         
         # odstranenie produktov ktore uz mame
         df_all_products = df_all_products[~df_all_products['style'].isin(df_products_to_score['style'].unique().tolist())] 
         
         # produkty a styly ktore ignorujeme
-        ignore_product_name, ignore_styles = self._get_ignored_pruducts_styles()
+        ignore_product_name, ignore_styles = self._get_ignored_pruducts_styles(sheets)
         if ignore_product_name: 
             df_all_products = df_all_products[(~df_all_products['product_name'].str.contains('|'.join(ignore_product_name)))]
             
@@ -242,20 +272,20 @@ class NewProductsAdder:
         df_final = self._create_country_columns(df_final, countries)
         
         # iba styly ktore sa aktualne vyskytuju na strankach
-        styles_on_web = get_live_styles()
+        styles_on_web = ProductCatalogue.load().live_styles
         df_final = df_final[df_final['style'].isin(styles_on_web)]
         
         # zmena kategorie
-        category_mapper = self._load_category_mapper()
+        category_mapper = self._load_category_mapper(sheets)
         df_final['category'] = df_final.apply(lambda row: category_mapper.get(row['style'], row['category']) , axis=1)
         
         # wait after relase nastavenie
-        wait_after_release_settings = self._load_wait_after_release_settings()
+        wait_after_release_settings = self._load_wait_after_release_settings(sheets)
         df_final['wait_after_release'] = df_final['style'].apply(lambda style: wait_after_release_settings.get(style, 21))
         
         # master switch nastavenie
-        master_switch_styles_settings = self._load_master_switch_styles_settings()
-        master_switch_brands_settings = self._load_master_switch_brands_settings()
+        master_switch_styles_settings = self._load_master_switch_styles_settings(sheets)
+        master_switch_brands_settings = self._load_master_switch_brands_settings(sheets)
         df_final['master_switch'] = df_final.apply(
             lambda row: 
             0 if ((row['style'] in master_switch_styles_settings.get('style_for_removal',[]) or (row['brand'] in master_switch_brands_settings.get('brand_for_removal',[])))) 
@@ -3,7 +3,6 @@ import pandas as pd
 import numpy as np
 import datetime as dt
 from libs.help_functions import (
-    get_conversion_rates,
     countryCompetitors2dict,
     clean_country_competitors,
     stylesDiscounts2dict,
@@ -14,7 +13,6 @@ from libs.help_functions import (
     stylesCategory2dict,
     waitAfterRelease2dict,
     is_important_competitor,
-    is_our_shop,
     get_country_code_from_url,
     minMaxDisctount2dict,
     COUNTRY_CODE_CURRENCY_MAPPER,
@@ -22,6 +20,9 @@ from libs.help_functions import (
     upload_dataframe_to_azure_blob_storage
 )
 from libs.google_sheets import GoogleSheetsApi
+from libs.loader_scheduler import LoaderScheduler
+from libs.fx import FxRates
+from libs.sales_cube import SalesCube
 from client_based_code.kickz_code import *
 
 # debug
@@ -58,6 +59,49 @@ def timeit(func):
     return wrapper_timeit
 
 class PricingLogic:
+    # stlpce z _get_sell_power_and_max_discount_ST
+    ST_COLUMNS = [
+        'sell_through_week', 'sell_power_week', 'sell_through_day', 'sell_power_day',
+        'max_discount_ST', 'min_discount_ST', 'ST_setting', 'ST_rate_pct', 'ST_discount_level'
+    ]
+    
+    # konfiguracne taby z Google Sheetu (+ vsetky '*__discount_levels' taby)
+    GOOGLE_SHEETS_TABS = [
+        'relevant_competitors',
+        'discount_levels_override',
+        'brand_discounts_imp',
+        'TEAM_SALE_discounts',
+        'DROPSHIPMENT_discounts',
+        'CARRYOVERS_discounts',
+        'TEAMSPORT_OVERSTOCK_discounts',
+        'TOTAL_CLEARANCE_discounts',
+        'INDOOR_SHOES_discounts',
+        'ST_settings',
+        'margin_settings',
+        'destroy_competitors',
+        'complementary_styles',
+        'pricing_groups_settings',
+        'ST_season_length_override',
+    ]
+    # struktury skompilovane z konfiguracnych tabov (ukladaju sa do snapshotu)
+    GOOGLE_SHEETS_ATTRIBUTES = [
+        'country_competitors',
+        'discount_levels',
+        'discount_levels_override',
+        'brand_discount',
+        'team_sale_discounts',
+        'dropshipment_discounts',
+        'carryovers_discounts',
+        'teamsport_overstock_discounts',
+        'total_clearance_discounts',
+        'indoor_shoes_discounts',
+        'st_settings',
+        'margin_settings',
+        'destroy_competitors_discount',
+        'complementary_styles_allowed_change',
+        'pricing_groups_settings',
+        'style_season_length_override',
+    ]
     
     def __init__(self, settings, category = None):
         self.settings = settings
@@ -78,37 +122,68 @@ class PricingLogic:
     @timeit   
     def _load_conversion_rates(self):
         """
-        Nacita aktualne konverzne kurzy z ECB pre EURO
+        Nacita posledne ulozene konverzne kurzy z ECB pre EURO (aktualizuju sa na pozadi)
         struktura: {'EUR': 1, 'USD': 1.12, 'JPY': 120.31, ... }
         """
-        
-        self.conversion_rates = get_conversion_rates()
+        self.fx = FxRates(self.settings.fx_rates_path)
+        self.conversion_rates = self.fx.latest()
         
     @timeit    
     def _load_data_from_google_sheets(self, sample_spreadsheet_id, path_token, path_client_secret):
         """
         Nacitanie dat z Google Sheetu
+        Ak sa sheet od posledneho behu nezmenil, konfiguracia sa nacita z lokalneho snapshotu
         """
         
         gapi = GoogleSheetsApi(path_token = path_token,
-                               path_client_secret = path_client_secret)
-        
-        self._load_competitors(gapi, sample_spreadsheet_id)
-        self._load_discount_levels(gapi, sample_spreadsheet_id)
-        self._load_discount_levels_override(gapi, sample_spreadsheet_id)
-        self._load_brand_discounts(gapi, sample_spreadsheet_id)
-        self._load_team_sale_discounts(gapi, sample_spreadsheet_id)
-        self._load_dropshipment_discounts(gapi, sample_spreadsheet_id)
-        self._load_carryovers_discounts(gapi, sample_spreadsheet_id)
-        self._load_teamsport_overstock_discounts(gapi, sample_spreadsheet_id)
-        self._load_total_clearance_discounts(gapi, sample_spreadsheet_id)
-        self._load_indoor_shoes_discounts(gapi, sample_spreadsheet_id)
-        self._load_st_settings(gapi, sample_spreadsheet_id)
-        self._load_margin_settings(gapi, sample_spreadsheet_id)
-        self._load_destroy_competitors_discounts(gapi, sample_spreadsheet_id)
-        self._load_complementary_styles(gapi, sample_spreadsheet_id)
-        self._load_pricing_groups_settings(gapi, sample_spreadsheet_id)
-        self._load_ST_style_season_length_override(gapi, sample_spreadsheet_id)
+                               path_client_secret = path_client_secret,
+                               snapshot_dir = self.settings.gs_snapshot_dir)
+        
+        google_sheets_data = gapi.load_snapshot(
+            sample_spredsheet_id = sample_spreadsheet_id,
+            snapshot_name = 'pricing_logic',
+            compile_func = lambda: self._compile_google_sheets_data(gapi, sample_spreadsheet_id),
+            required_keys = self.GOOGLE_SHEETS_ATTRIBUTES
+        )
+        
+        for attribute in self.GOOGLE_SHEETS_ATTRIBUTES:
+            setattr(self, attribute, google_sheets_data[attribute])
+    
+    @timeit
+    def _compile_google_sheets_data(self, gapi, sample_spreadsheet_id):
+        """
+        Stiahne konfiguracne taby a skompiluje z nich struktury (self.discount_levels, ...)
+        Vrati (data, tabs) pre GoogleSheetsApi.load_snapshot
+        """
+        # vsetky potrebne taby sa stiahnu jednym batchGet volanim
+        # taby ktore v sheete neexistuju sa nestahuju (batchGet by zlyhal)
+        tabs = gapi.get_tabs_names(sample_spreadsheet_id)
+        tabs_to_load = [
+            tab for tab in tabs
+            if tab in self.GOOGLE_SHEETS_TABS or '__discount_levels' in tab
+        ]
+        sheets = gapi.google_sheets2dfs(sample_spreadsheet_id, tabs_to_load)
+        
+        self._load_competitors(sheets)
+        self._load_discount_levels(sheets)
+        self._load_discount_levels_override(sheets)
+        self._load_brand_discounts(sheets)
+        self._load_team_sale_discounts(sheets)
+        self._load_dropshipment_discounts(sheets)
+        self._load_carryovers_discounts(sheets)
+        self._load_teamsport_overstock_discounts(sheets)
+        self._load_total_clearance_discounts(sheets)
+        self._load_indoor_shoes_discounts(sheets)
+        self._load_st_settings(sheets)
+        self._load_margin_settings(sheets)
+        self._load_destroy_competitors_discounts(sheets)
+        self._load_complementary_styles(sheets)
+        self._load_pricing_groups_settings(sheets)
+        self._load_ST_style_season_length_override(sheets)
+        
+        data = {attribute: getattr(self, attribute) for attribute in self.GOOGLE_SHEETS_ATTRIBUTES}
+        
+        return data, tabs_to_load
         
     @timeit
     def _load_products_to_score(self):
@@ -124,13 +199,13 @@ class PricingLogic:
         self._load_wait_after_release(df_products_to_score)
           
     @timeit
-    def _load_competitors(self, gapi, sample_spreadsheet_id):
+    def _load_competitors(self, sheets):
         """
         Nacita konkurenciu z google sheetu
         struktura: {'SK': ['nike', 'adidas', ...], 'AT': ['zalando','footlocker',...]}
         """
         
-        df_competitors = gapi.google_sheet2df(sample_spreadsheet_id, 'relevant_competitors')
+        df_competitors = sheets.get('relevant_competitors')
         
         # dictionary
         country_competitors = countryCompetitors2dict(df_competitors)
@@ -266,7 +341,7 @@ class PricingLogic:
         self.df_gapi_714_ratios = df_gads_ratio
         
     @timeit
-    def _load_discount_levels(self, gapi, sample_spreadsheet_id):
+    def _load_discount_levels(self, sheets):
         """
         Nacita discount levels pre kazdu krajinu pripadne pre HARD_SALE, SOFT_SALE, ENTRY_SALE
         
@@ -278,19 +353,18 @@ class PricingLogic:
                                                    'Discount Level 4': 0.45,
                                                    'Discount Level 5': 0.5},
         """
-        tabs = gapi.get_tabs_names(sample_spreadsheet_id)
-        discount_levels_tabs = [tab for tab in tabs if '__discount_levels' in tab]
+        discount_levels_tabs = [tab for tab in sheets if '__discount_levels' in tab]
 
         discount_levels = {}
         for tab_name in discount_levels_tabs:
             main_index = tab_name.split('__')[0]
-            df_discount_levels = gapi.google_sheet2df(sample_spreadsheet_id, tab_name)
+            df_discount_levels = sheets[tab_name]
             discount_levels[main_index] = discountLevels2dict(df_discount_levels)
 
         self.discount_levels = discount_levels
         
     @timeit
-    def _load_brand_discounts(self,gapi, sample_spreadsheet_id):
+    def _load_brand_discounts(self, sheets):
         """
         Nacita zlavy pre znacku
         
@@ -303,7 +377,7 @@ class PricingLogic:
          ...
          }
         """        
-        df_brand_discount = gapi.google_sheet2df(sample_spreadsheet_id, 'brand_discounts_imp')
+        df_brand_discount = sheets.get('brand_discounts_imp')
         
         self.brand_discount = df_brand_discount.assign(brand=lambda x: x.brand.str.lower().str.strip())\
                                                .dropna(subset=['brand'])\
@@ -319,14 +393,14 @@ class PricingLogic:
                                                .get('discount')
     
     @timeit
-    def _load_team_sale_discounts(self, gapi, sample_spreadsheet_id):
+    def _load_team_sale_discounts(self, sheets):
         """
         Nacita zlavy pre team sales vypredaj (category = TEAM_SALE)
         
         struktura:
         {'puma': {'min_discount': 0.3, 'max_discount': 0.8}}
         """
-        df = gapi.google_sheet2df(sample_spreadsheet_id, 'TEAM_SALE_discounts')
+        df = sheets.get('TEAM_SALE_discounts')
         
         if df is not None:
             self.team_sale_discounts = minMaxDisctount2dict(df)
@@ -334,14 +408,14 @@ class PricingLogic:
             self.team_sale_discounts = {}
             
     @timeit
-    def _load_dropshipment_discounts(self, gapi, sample_spreadsheet_id):
+    def _load_dropshipment_discounts(self, sheets):
         """
         Nacita zlavy pre team sales vypredaj (category = DROPSHIPMENT)
         
         struktura:
         {'puma': {'min_discount': 0.3, 'max_discount': 0.8}}
         """
-        df = gapi.google_sheet2df(sample_spreadsheet_id, 'DROPSHIPMENT_discounts')
+        df = sheets.get('DROPSHIPMENT_discounts')
         
         if df is not None:
             self.dropshipment_discounts = minMaxDisctount2dict(df)
@@ -349,63 +423,63 @@ class PricingLogic:
             self.dropshipment_discounts = {}
     
     @timeit
-    def _load_carryovers_discounts(self, gapi, sample_spreadsheet_id):
+    def _load_carryovers_discounts(self, sheets):
         """
         Nacita zlavy pre carryovers (category = CARRYOVERS)
         
         struktura:
         {'puma': {'min_discount': 0.3, 'max_discount': 0.8}}
         """
-        df = gapi.google_sheet2df(sample_spreadsheet_id, 'CARRYOVERS_discounts')
+        df = sheets.get('CARRYOVERS_discounts')
         if df is not None:
             self.carryovers_discounts = minMaxDisctount2dict(df)
         else:
             self.carryovers_discounts = {}
             
     @timeit
-    def _load_teamsport_overstock_discounts(self, gapi, sample_spreadsheet_id):
+    def _load_teamsport_overstock_discounts(self, sheets):
         """
         Nacita zlavy pre (category = TEAMSPORT_OVERSTOCK)
         
         struktura:
         {'puma': {'min_discount': 0.3, 'max_discount': 0.8}}
         """
-        df = gapi.google_sheet2df(sample_spreadsheet_id, 'TEAMSPORT_OVERSTOCK_discounts')
+        df = sheets.get('TEAMSPORT_OVERSTOCK_discounts')
         if df is not None:
             self.teamsport_overstock_discounts = minMaxDisctount2dict(df)
         else:
             self.teamsport_overstock_discounts = {}
             
     @timeit
-    def _load_total_clearance_discounts(self, gapi, sample_spreadsheet_id):
+    def _load_total_clearance_discounts(self, sheets):
         """
         Nacita zlavy pre (category = TOTAL_CLEARANCE)
         
         struktura:
         {'puma': {'min_discount': 0.3, 'max_discount': 0.8}}
         """
-        df = gapi.google_sheet2df(sample_spreadsheet_id, 'TOTAL_CLEARANCE_discounts')
+        df = sheets.get('TOTAL_CLEARANCE_discounts')
         if df is not None:
             self.total_clearance_discounts = minMaxDisctount2dict(df)
         else:
             self.total_clearance_discounts = {}
     
     @timeit
-    def _load_indoor_shoes_discounts(self, gapi, sample_spreadsheet_id):
+    def _load_indoor_shoes_discounts(self, sheets):
         """
         Nacita zlavy pre (category = INDOOR_SHOES)
         
         struktura:
         {'puma': {'min_discount': 0.3, 'max_discount': 0.8}}
         """
-        df = gapi.google_sheet2df(sample_spreadsheet_id, 'INDOOR_SHOES_discounts')
+        df = sheets.get('INDOOR_SHOES_discounts')
         if df is not None:
             self.indoor_shoes_discounts = minMaxDisctount2dict(df)
         else:
             self.indoor_shoes_discounts = {}
     
     @timeit
-    def _load_st_settings(self, gapi, sample_spreadsheet_id):
+    def _load_st_settings(self, sheets):
         """
         Nacita nastavenie ST produktov
         
@@ -413,7 +487,7 @@ class PricingLogic:
         {('SK', 'football'): {'setting': 'GENERAL', 'rate_pct': 8.0},
          ('CZ', 'football')': {'setting': 'GENERAL', 'rate_pct': 8.0},...}"""
 
-        df = gapi.google_sheet2df(sample_spreadsheet_id, 'ST_settings')
+        df = sheets.get('ST_settings')
         if df is not None:
             df['rate_pct'] = df['rate_pct'].astype(float)
             df['category'] = df['category'].str.strip()
@@ -425,7 +499,7 @@ class PricingLogic:
             self.st_settings = {}
         
     @timeit
-    def _load_ST_style_season_length_override(self, gapi, sample_spreadsheet_id):
+    def _load_ST_style_season_length_override(self, sheets):
         """
         Nacita prepisanu dlzku sezony pre jednotlive styly
         struktura:
@@ -434,7 +508,7 @@ class PricingLogic:
             'abc': {'Sk': 15, ...},
         }
         """
-        df_style_season_length_override = gapi.google_sheet2df(sample_spreadsheet_id, 'ST_season_length_override')
+        df_style_season_length_override = sheets.get('ST_season_length_override')
         if df_style_season_length_override is not None:
             style_season_length_override = df_style_season_length_override.drop('note', axis=1)\
                                                                            .drop_duplicates('style')\
@@ -450,28 +524,28 @@ class PricingLogic:
         self.style_season_length_override = style_season_length_override
     
     @timeit
-    def _load_margin_settings(self, gapi, sample_spreadsheet_id):
+    def _load_margin_settings(self, sheets):
         """
         Nacita nastavenie margin 
         
         struktura:
         {'SK': {'target_margin': 35,'use_in_country': False}, 'CZ': {'target_margin': 38, 'use_in_country': True}, ...}
         """
-        df_margin_settings = gapi.google_sheet2df(sample_spreadsheet_id, 'margin_settings')
+        df_margin_settings = sheets.get('margin_settings')
         df_margin_settings['target_margin'] = df_margin_settings['target_margin'].astype(float)
         df_margin_settings['use_in_country'] = df_margin_settings['use_in_country'].astype(int).fillna(0).astype(bool)
         
         self.margin_settings = df_margin_settings.drop_duplicates(subset='country_code', keep='last').set_index('country_code').to_dict('index')
     
     @timeit
-    def _load_destroy_competitors_discounts(self, gapi, sample_spreadsheet_id):
+    def _load_destroy_competitors_discounts(self, sheets):
         """
         Nacita maximalne mozne zlavy pre discount_competitors
         
         struktura:
         {(style1, country_code1): 0.3, (style2, country_code2): 0.1, ...}
         """
-        df_destroy_competitors = gapi.google_sheet2df(sample_spreadsheet_id, 'destroy_competitors')
+        df_destroy_competitors = sheets.get('destroy_competitors')
         if df_destroy_competitors is None:
             destroy_competitors_discount = {}
         
@@ -497,7 +571,7 @@ class PricingLogic:
         self.wait_after_release = waitAfterRelease2dict(df_products_to_score)
     
     @timeit
-    def _load_complementary_styles(self, gapi,sample_spreadsheet_id):
+    def _load_complementary_styles(self, sheets):
         """
         Nacita ktorym smerom je mozne hybat ceny pre komplenetarne styly
         
@@ -505,12 +579,12 @@ class PricingLogic:
         ['INCREASE','DECREASE']
         """
         
-        df_complementary_styles = gapi.google_sheet2df(sample_spreadsheet_id, 'complementary_styles')
+        df_complementary_styles = sheets.get('complementary_styles')
         
         self.complementary_styles_allowed_change = df_complementary_styles[df_complementary_styles['setting'] =='1']['allow'].unique().tolist()
        
     @timeit
-    def _load_pricing_groups_settings(self, gapi, sample_spreadsheet_id):
+    def _load_pricing_groups_settings(self, sheets):
         """
         Nacita nastavenie pre skorovanie items kategorii
 
@@ -530,7 +604,7 @@ class PricingLogic:
             }
         """
 
-        df_pricing_groups_settings = gapi.google_sheet2df(sample_spreadsheet_id, 'pricing_groups_settings')
+        df_pricing_groups_settings = sheets.get('pricing_groups_settings')
         if df_pricing_groups_settings is None:
             self.pricing_groups_settings = {}
         
@@ -539,7 +613,7 @@ class PricingLogic:
             self.pricing_groups_settings = df_pricing_groups_settings.to_dict(orient='index')
     
     @timeit
-    def _load_discount_levels_override(self, gapi, sample_spreadsheet_id):
+    def _load_discount_levels_override(self, sheets):
         """
         Nacita discount levels override 
 
@@ -554,7 +628,7 @@ class PricingLogic:
                 ...
             }
         """
-        df_discount_levels_override = gapi.google_sheet2df(sample_spreadsheet_id, 'discount_levels_override')
+        df_discount_levels_override = sheets.get('discount_levels_override')
 
         if df_discount_levels_override is not None:
             discount_levels_override = discountLevels2dict(df_discount_levels_override, index=['Scoring type','Brand','Country','Category'])
@@ -566,14 +640,15 @@ class PricingLogic:
     @timeit
     def _load_orders(self, styles, from_date = None, to_date = None):
         """
-        Nacita historiu objednavok
+        Nacita historiu objednavok (agregovanu po dnoch)
         
         Musi obsahovat polia:
-            - style (str)
-            - country_code (str)
+            - style (category)
+            - country_code (category)
             - date (datetime)
+            - quantity (int)
         """
-        self.df_orders =  get_orders(
+        self.df_orders =  DailyOrdersStore.load(
             styles = styles, 
             from_date = from_date,
             to_date = to_date
@@ -589,11 +664,12 @@ class PricingLogic:
         struktura: {'style_1': 10, 'style_2': 3}
         """
         
-        # stav skladu k danemu dnu
-        self.quantities_in_inventory = get_quantities_from_inventory(styles, as_dict=True, nth_latest=1)
+        # stav skladu k danemu dnu a 7 dni dozadu jednym dotazom
+        week_ago = self.run_time.date() - dt.timedelta(days=7)
+        df_inventory = get_inventory_snapshots(snapshots=[1, week_ago], styles=styles)
         
-        # stav skladu 7 dni dozadu
-        self.quantities_in_inventory_7days = get_quantities_from_inventory(styles, as_dict=True, nth_latest=1)
+        self.quantities_in_inventory = df_inventory[1].dropna().astype(int).to_dict()
+        self.quantities_in_inventory_7days = df_inventory[week_ago].dropna().astype(int).to_dict()
         
         # vsetky unikatne styly z inv7 a inv30
         self.inventory_history_styles = set(self.quantities_in_inventory.keys()) | set(self.quantities_in_inventory_7days.keys())
@@ -609,19 +685,9 @@ class PricingLogic:
         with open(self.settings.google_service_account_json_path, "r") as f:
             credentials = json.load(f)
             
-        df = load_competitors_data(credentials, from_date, to_date, 90)
-        
-        df['currency'] = df.apply(
-            lambda row: COUNTRY_CODE_CURRENCY_MAPPER[row['country_code']] 
-            if row['currency'] == '' 
-            else row['currency'],
-            axis=1
-        )
-        
-        df['is_our_shop'] = df.apply(
-            lambda row: is_our_shop(row['url'], row['competitor_shop_name'],['kickz']), 
-            axis=1
-        )
+        # posledna dostupna cena pre dany link, bez nasho shopu a s doplnenou menou (vsetko v BQ)
+        df = load_latest_competitors_data(credentials, from_date, to_date, 90, exclude_shops=('kickz',))
+        df['is_our_shop'] = False
         
         df['is_important_competitor'] = df.apply(
             lambda row: is_important_competitor(row, country_competitors, 90),
@@ -631,17 +697,15 @@ class PricingLogic:
         
         # KONVERZIA LOKALNEJ CENY NA EURA !!!
         if not df.empty:
-            df['price'] = df.apply(
-                lambda row: row['price'] / self.conversion_rates[COUNTRY_CODE_CURRENCY_MAPPER[row['country_code']]], 
-                axis=1
+            df['price'] = self.fx.convert(
+                df['price'], 
+                df['country_code'].astype(str).map(COUNTRY_CODE_CURRENCY_MAPPER), 
+                'EUR'
             )
         
         # treba nastavit kvol izachovanie rovnakej struktury ako s prisyncom
         df['in_stock'] = 1
         df['change_day'] = 0
-                                                                            
-        # posledna dostupna cena pre dany link
-        df = df.sort_values(by=['url','date']).drop_duplicates(subset=['url'],keep='last')
     
         self.df_price_history = df.round(2)
     
@@ -695,51 +759,92 @@ class PricingLogic:
         """
         self.prices_with_VAT = get_prices_with_VAT(pricing_logic_data = self.__dict__)
         
-    @timeit       
+    @timeit
     def _load_data(self):
-        logger.info('loading conversion rates...')
-        self._load_conversion_rates()
-        
-        logger.info('loading data from google sheets...')
-        self._load_data_from_google_sheets(
-            sample_spreadsheet_id = self.settings.gs_spreadsheet_id,
-            path_token = self.settings.gs_path_token,
-            path_client_secret = self.settings.gs_path_client_secret
+        """
+        Nacita vsetky vstupne data. Nezavisle loadery bezia paralelne,
+        kazdy loader zacne hned ako su nacitane vsetky jeho vstupy.
+        """
+        scheduler = LoaderScheduler(
+            max_workers = self.settings.loaders_max_workers,
+            default_timeout = self.settings.loaders_timeout
         )
-         
-        logger.info('loading data from google ads...')
-        self._load_google_ads()
-        
-        logger.info('loading products_to_score data from S3')
-        self._load_products_to_score()
-        
-        logger.info('loading orders...')
-        self._load_orders(styles = self.styles, 
-                          from_date = self.run_time.date() - dt.timedelta(190))
-        
-        logger.info('loading quantity in inventory...')
-        self._load_quantities_in_inventory(styles = self.styles)
-        
-        logger.info('loading competitors data...')
-        self._load_price_history(
-            country_competitors = self.country_competitors
+
+        scheduler.add(
+            'conversion_rates',
+            self._load_conversion_rates,
+            timeout = 120
         )
-        
-        logger.info('loading our prices...')
-        self._load_prices_with_VAT()
-        
-        logger.info('loading rcmnd history...')
-        self._load_rcmnd_history(history_days = 6)
-        
-        logger.info('loading past sell power...')
-        self._load_past_sell_power(history_days = 6)
-        
-        logger.info('loading last changed days ago...')
-        self._load_last_changed_days_ago()
-        
-        logger.info('loading style items categories...')
-        self._load_items_categories(styles = self.styles)
-        
+        scheduler.add(
+            'google_sheets',
+            lambda: self._load_data_from_google_sheets(
+                sample_spreadsheet_id = self.settings.gs_spreadsheet_id,
+                path_token = self.settings.gs_path_token,
+                path_client_secret = self.settings.gs_path_client_secret
+            )
+        )
+        scheduler.add(
+            'google_ads',
+            self._load_google_ads
+        )
+        scheduler.add(
+            'products_to_score',
+            self._load_products_to_score
+        )
+        scheduler.add(
+            'orders',
+            lambda: self._load_orders(
+                styles = self.styles,
+                from_date = self.run_time.date() - dt.timedelta(190)
+            ),
+            depends_on = ['products_to_score']
+        )
+        scheduler.add(
+            'quantities_in_inventory',
+            lambda: self._load_quantities_in_inventory(styles = self.styles),
+            depends_on = ['products_to_score']
+        )
+        scheduler.add(
+            'price_history',
+            lambda: self._load_price_history(country_competitors = self.country_competitors),
+            depends_on = ['google_sheets', 'conversion_rates']
+        )
+        scheduler.add(
+            'prices_with_VAT',
+            self._load_prices_with_VAT,
+            depends_on = ['products_to_score', 'conversion_rates', 'catalogue']
+        )
+        scheduler.add(
+            'rcmnd_history',
+            lambda: self._load_rcmnd_history(history_days = 6)
+        )
+        scheduler.add(
+            'past_sell_power',
+            lambda: self._load_past_sell_power(history_days = 6),
+            depends_on = ['rcmnd_history']
+        )
+        scheduler.add(
+            'last_changed_days_ago',
+            self._load_last_changed_days_ago,
+            depends_on = ['rcmnd_history']
+        )
+        scheduler.add(
+            'catalogue',
+            ProductCatalogue.load
+        )
+        scheduler.add(
+            'items_categories',
+            lambda: self._load_items_categories(styles = self.styles),
+            depends_on = ['products_to_score', 'catalogue']
+        )
+
+        scheduler.run()
+
+        #debug
+        self.loaders_stats = scheduler.stats
+        self.loaders_critical_path = scheduler.critical_path
+        POOL.log_stats()
+
     @timeit
     def _get_data_from_discount_levels(self, country_code, category, brand, item_category, item_group0): 
         # custom logic for HARD_SALE
@@ -758,51 +863,31 @@ class PricingLogic:
         )
         
     @timeit
-    def _get_product_demand(self, product_styles, timestamp_days = 7, country_codes = ['ALL']):
+    def _get_product_demand(self, group_ids, style_ids, country_ids, n_groups, timestamp_days = 7):
+        """
+        Indikator ci demand ide hore pre vsetky skupiny (produkty alebo styly) naraz.
+        Riadok (style_ids[i], country_ids[i]) patri do skupiny group_ids[i].
+        
+        Vrati np.array dlzky n_groups
+        """
+        group_ids = np.asarray(group_ids, dtype=np.int64)
         
         # pocet predanych kusov za poslednych 'timestamp_days' dni
-        this_week_demand = self._get_sold_items(styles = product_styles, 
-                                                country_codes = country_codes, 
-                                                last_x_days = timestamp_days)
-
+        this_week_demand = np.bincount(group_ids, 
+                                       weights = self.sales.sold(style_ids, country_ids, timestamp_days), 
+                                       minlength = n_groups)
 
         # pocet predanych kusov za od timestamp_days az timestamp_days*2 dozadu
-        last_week_demand = (self._get_sold_items(styles = product_styles, 
-                                                 country_codes = country_codes, 
-                                                 last_x_days = timestamp_days*2) 
-                            - this_week_demand)
+        last_week_demand = np.bincount(group_ids, 
+                                       weights = self.sales.sold(style_ids, country_ids, timestamp_days*2), 
+                                       minlength = n_groups) - this_week_demand
 
         # indikator ci demand ide hore
-        if last_week_demand == 0:
-            if this_week_demand > 0:
-                product_demand = this_week_demand
-            else:
-                product_demand = 0
-        else:
-            product_demand = this_week_demand / last_week_demand
-
-        return product_demand
-    
-    @timeit
-    def _get_sold_items(self, styles, country_codes = ['ALL'], last_x_days = None):
-        """
-        Vrati pocet predanych kusov za poslednych 'last_x_days' dni
-        """
-        
-        # ked chceme pocet predanych kusov za cele dostupne obdobie
-        if last_x_days is None or last_x_days > self.max_last_x_days:
-            last_x_days = self.max_last_x_days
-            
-        
-        sold_items = 0
-        for style in styles:
-            for country_code in country_codes:
-                try:
-                    sold_items += self.df_sold_items_history.at[(style, country_code, last_x_days), 'quantity']
-                except:
-                    pass
-        
-        return sold_items
+        return np.where(
+            last_week_demand == 0,
+            np.maximum(this_week_demand, 0),
+            this_week_demand / np.where(last_week_demand == 0, 1, last_week_demand)
+        )
     
     @timeit
     def _get_min_max_discount(self,data):
@@ -949,43 +1034,49 @@ class PricingLogic:
         return season_length, days_from_season_start
     
     @timeit
-    def _get_ST_data(self, product, brand, country_code, style, category, item_category, item_group0):
+    def _get_ST_data(self, data_for_pricing):
         """
-        Vytvori data pre vypocet ST a sell power
+        Vytvori data pre vypocet ST a sell power pre vsetky riadky data_for_pricing naraz
+        Vrati dict so stlpcami (list) v poradi riadkov
         """
-        season_length, days_from_season_start = self._get_season_length_and_days_from_season_start(style, product, country_code, category, brand, item_category, item_group0)
-        quantity_in_inventory = self.quantities_in_inventory.get((brand, style), np.nan)
-        
-        if item_category is None:
-            item_category = 'unknown'
-            
-        ST_setting = self.st_settings.get((country_code, item_category), {}).get('setting')
-        ST_rate_pct = self.st_settings.get((country_code, item_category), {}).get('rate_pct', 100)
+        ST_settings = [
+            self.st_settings.get((data['country_code'], data['item_category'] if data['item_category'] is not None else 'unknown'), {})
+            for data in data_for_pricing
+        ]
+        ST_setting = np.array([settings.get('setting') for settings in ST_settings], dtype=object)
+        ST_rate_pct = np.array([settings.get('rate_pct', 100) for settings in ST_settings], dtype=object)
+        
+        # ST_setting == 'COUNTRY' => predaje v krajine, inak vo vsetkych krajinach
+        style_ids = self.sales.style_ids([data['style'] for data in data_for_pricing])
+        country_ids = np.where(
+            ST_setting == 'COUNTRY',
+            self.sales.country_ids([data['country_code'] for data in data_for_pricing]),
+            self.sales.country_ids([SalesCube.ALL])[0]
+        )
+        days_from_season_start = np.array([data['days_from_season_start'] for data in data_for_pricing], dtype=float)
         
-        if ST_setting == 'COUNTRY':
-            sold_items_today = self._get_sold_items([style], country_codes=[country_code], last_x_days = 0)
-            sold_items_7_days = self._get_sold_items([style], country_codes=[country_code], last_x_days = 7)
-            sold_items_season = self._get_sold_items([style], country_codes=[country_code], last_x_days = days_from_season_start)       
-        else:
-            sold_items_today = self._get_sold_items([style], last_x_days = 0)
-            sold_items_7_days = self._get_sold_items([style], last_x_days = 7)
-            sold_items_season = self._get_sold_items([style], last_x_days = days_from_season_start)
-            
+        sold_items = self.sales.sold(
+            style_ids[:, None], 
+            country_ids[:, None], 
+            np.column_stack([np.zeros(len(data_for_pricing)), np.full(len(data_for_pricing), 7), days_from_season_start])
+        ).reshape(len(data_for_pricing), 3)
         
         return {
-            'season_length': season_length,
-            'days_from_season_start': days_from_season_start,
-            'quantity_in_inventory': quantity_in_inventory,
-            'ST_setting': ST_setting,
-            'ST_rate_pct': ST_rate_pct,
-            'sold_items_today': sold_items_today,
-            'sold_items_7_days': sold_items_7_days,
-            'sold_items_season': sold_items_season  
+            'season_length': [data['season_length'] for data in data_for_pricing],
+            'days_from_season_start': [data['days_from_season_start'] for data in data_for_pricing],
+            'quantity_in_inventory': [data['quantity_in_inventory'] for data in data_for_pricing],
+            'ST_setting': ST_setting.tolist(),
+            'ST_rate_pct': ST_rate_pct.tolist(),
+            'sold_items_today': sold_items[:, 0].tolist(),
+            'sold_items_7_days': sold_items[:, 1].tolist(),
+            'sold_items_season': sold_items[:, 2].tolist()
         }
     
     @timeit
-    def _get_sell_power_and_max_discount_ST(self, product, brand, country_code, style, 
-                                            category, item_category, item_group0):
+    def _get_sell_power_and_max_discount_ST(self, country_code, brand, category, item_category, item_group0, ST_data):
+        """
+        ST_data: riadok z _get_ST_data
+        """
         # nastavenie zliav pre krajinu a znacku
         brand_discount_settings = self._get_data_from_discount_levels(country_code, category, brand, item_category, item_group0)
         
@@ -1000,7 +1091,6 @@ class PricingLogic:
             ST_rate_pct = np.nan
             discount_level = np.nan
         else:
-            ST_data = self._get_ST_data(product, brand, country_code, style, category, item_category, item_group0)
             ST_setting = ST_data['ST_setting']
             ST_rate_pct = ST_data['ST_rate_pct']
             min_discount = brand_discount_settings['Discount Level 1']
@@ -1061,48 +1151,17 @@ class PricingLogic:
     def _compute_sold_items(self):
         """
         Pre kazdy styl spocita pocet predanych kusov za poslednych x dni
-        Vrati dataframe kde index je style a last_x_days
+        (kumulativny cube [style, country_code + ALL, last_x_days])
         
         Priklad:
-            df_sold_items_history.at[('000544-bk-01', 'DE', 30), 'quantity'] 
+            self.sales.sold(self.sales.style_ids(['000544-bk-01']), self.sales.country_ids(['DE']), 30)
             vrati pocet predanych kusov za poslednych 30 dni v DE
         """
-        today = self.run_time.date()
-        df_orders = self.df_orders[['date','style','country_code','quantity']]
-        
-        max_last_x_days = (df_orders['date'].max() - df_orders['date'].min()).days
-        if np.isnan(max_last_x_days):
-            max_last_x_days  = 0
-
-        sold_items_history = []
-        for days in range(0, max_last_x_days + 1):
-            from_date = today - dt.timedelta(days=days)
-            df_orders_days = df_orders[df_orders['date'] >= pd.Timestamp(from_date)]
-            
-            df_orders_grouped = df_orders_days.groupby(['style','country_code'])[['quantity']].sum()
-            df_orders_grouped['last_x_days'] = days
-            
-            sold_items_history.append(df_orders_grouped)
-        
-        # pocet predanych kusov podla krajin
-        sold_items_history_countries = pd.concat(sold_items_history)\
-                                         .reset_index()
-        
-        
-        if not sold_items_history_countries.empty:
-            # pocet predanych kusov vo vsetkych krajinach dokopy
-            sold_items_history_total = sold_items_history_countries.groupby(['style','last_x_days'],
-                                                                            as_index=False)[['quantity']]\
-                                                                   .sum()
-            sold_items_history_total['country_code'] = 'ALL'
-            
-            df_sold_items_history = pd.concat([sold_items_history_countries, sold_items_history_total])\
-                                      .set_index(['style','country_code','last_x_days'])
-        else:
-            df_sold_items_history = pd.DataFrame()
-        
-        self.max_last_x_days = max_last_x_days
-        self.df_sold_items_history = df_sold_items_history
+        self.sales = SalesCube.from_orders(
+            self.df_orders[['date','style','country_code','quantity']],
+            today = self.run_time.date()
+        )
+        self.max_last_x_days = self.sales.max_last_x_days
     
     @timeit
     def _compupte_ads_attributes(self, country_code, style):
@@ -1208,7 +1267,7 @@ class PricingLogic:
               & (df_price_history['is_our_shop'] == False)
         ]
         
-        self.competitors_comparison = df_price_history.groupby(['style','country_code'])\
+        self.competitors_comparison = df_price_history.groupby(['style','country_code'], observed=True)\
                                                       .apply(product_competitors_summary)\
                                                       .to_frame('data')\
                                                       .to_dict('dict')\
@@ -1290,7 +1349,44 @@ class PricingLogic:
     def _create_data_for_pricing(self):
         data_for_pricing  = []
         
-        for product in self.products:
+        # predaje pre vsetky produkty a styly naraz (jedno citanie zo sales cube)
+        all_country_id = self.sales.country_ids([SalesCube.ALL])[0]
+        
+        product_group_ids, product_styles_list = [], []
+        for i, product in enumerate(self.products):
+            product_group_ids += [i] * len(self.prods_styles[product])
+            product_styles_list += list(self.prods_styles[product])
+            
+        products_demand = self._get_product_demand(group_ids = product_group_ids,
+                                                   style_ids = self.sales.style_ids(product_styles_list),
+                                                   country_ids = all_country_id,
+                                                   n_groups = len(self.products),
+                                                   timestamp_days = 7).tolist()
+        
+        all_styles = list(dict.fromkeys(product_styles_list))
+        style_index = {style: i for i, style in enumerate(all_styles)}
+        
+        # style demand len z krajin kde je spusteny autopricing
+        style_group_ids, style_country_styles, style_country_codes = [], [], []
+        for i, style in enumerate(all_styles):
+            for country_code, scoring in self.score_style_in_country[style].items():
+                if scoring:
+                    style_group_ids.append(i)
+                    style_country_styles.append(style)
+                    style_country_codes.append(country_code)
+        
+        styles_demand = self._get_product_demand(group_ids = style_group_ids,
+                                                 style_ids = self.sales.style_ids(style_country_styles),
+                                                 country_ids = self.sales.country_ids(style_country_codes),
+                                                 n_groups = len(all_styles),
+                                                 timestamp_days = 7).tolist()
+        
+        # pocet predanych kusov zo stylu CELKOVO (nie iba v danej krajine): cele obdobie, dnes, 7 a 14 dni
+        styles_sold_items = self.sales.sold(self.sales.style_ids(all_styles)[:, None], 
+                                            all_country_id, 
+                                            [None, 0, 7, 14]).reshape(len(all_styles), 4).tolist()
+        
+        for i, product in enumerate(self.products):
             logger.debug(f'PRODUCT: {product}')
             
             # znacka 
@@ -1300,8 +1396,7 @@ class PricingLogic:
             product_styles = self.prods_styles[product]
             
             # indikator ci demand ide hore pre dany produkt 
-            product_demand = self._get_product_demand(product_styles = product_styles, 
-                                                      timestamp_days = 7)
+            product_demand = products_demand[i]
             
             for country_code in self.country_codes:
                 logger.debug(f'Checking country: {country_code}')
@@ -1314,11 +1409,7 @@ class PricingLogic:
                     data_style_competitors = self._get_competitors_comparison(style, country_code, prefix='style')
                     
                     # style demand 
-                    # list country_codes kde je spusteny autopricing
-                    scored_countries_country_codes = [country_code for country_code,scoring in self.score_style_in_country[style].items() if scoring]
-                    style_demand = self._get_product_demand(product_styles = [style], 
-                                                            timestamp_days = 7,
-                                                            country_codes = scored_countries_country_codes)
+                    style_demand = styles_demand[style_index[style]]
                     
                     # pocet kusob na sklade
                     quantity_in_inventory = self.quantities_in_inventory.get((brand,style), np.nan)
@@ -1339,11 +1430,8 @@ class PricingLogic:
                     season_length, days_from_season_start = self._get_season_length_and_days_from_season_start(style, product, country_code, category, brand, item_category, item_group0)
                     
                     # pocet predanych kusov z danneho stylu CELKOVO (nie iba v danej krajine)
-                    sold_items = self._get_sold_items([style], last_x_days = None)
-                    sold_items_today = self._get_sold_items([style], last_x_days = 0)
-                    sold_items_7_days = self._get_sold_items([style], last_x_days = 7)
-                    sold_items_14_days = self._get_sold_items([style], last_x_days = 14)
-                    sold_items_season = self._get_sold_items([style], last_x_days = days_from_season_start)
+                    # (sold_items_season sa doplni po cykle pre vsetky riadky naraz)
+                    sold_items, sold_items_today, sold_items_7_days, sold_items_14_days = styles_sold_items[style_index[style]]
                     
                     # demand key, group logic
                     demand_key, demand_key_original, group_logic = self._get_demand_key_and_group_logic(style, 
@@ -1382,10 +1470,6 @@ class PricingLogic:
                     # currency
                     currency = self.prices_with_VAT.get((style, country_code),{}).get('currency')
                     
-                    # sell_power, max discount ST
-                    sell_power_max_discount_ST = self._get_sell_power_and_max_discount_ST(product,brand, country_code, 
-                                                                                          style, category, item_category, item_group0)
-                    
                     # kolko percent sme nad alebo pod ocakavanou marzou
                     diff_to_expected_margin = self._compute_diff_to_expected_margin(style, country_code)
                     
@@ -1412,7 +1496,7 @@ class PricingLogic:
                     data['sold_items_day'] = sold_items_today
                     data['sold_items_7_days'] = sold_items_7_days
                     data['sold_items_14_days'] = sold_items_14_days
-                    data['sold_items_season'] = sold_items_season
+                    data['sold_items_season'] = np.nan
                     data['sold_inventory_7_ratio'] = sold_inventory_7_ratio
                     data['quantity_in_inventory'] = quantity_in_inventory
                     data['quantity_in_inventory_7days'] = quantity_in_inventory_7days
@@ -1426,11 +1510,11 @@ class PricingLogic:
                     data['nodes_path'] = ''
                     data.update(data_product_competitors)
                     data.update(data_style_competitors)
-                    data.update(sell_power_max_discount_ST)
+                    data.update(dict.fromkeys(self.ST_COLUMNS, np.nan))
                     data['last_day_sell_power_week'] = round(self.past_sell_power.get((data['country_code'], data['style']),{})\
                                                                                  .get('sell_power_week',np.nan),2)
                     data['overriden_discount'] = self.discount_override[style][country_code]
-                    data['min_discount'], data['max_discount'] = self._get_min_max_discount(data)
+                    data['min_discount'], data['max_discount'] = np.nan, np.nan
                     data['last_changed_days_ago'] = self.last_changed_days_ago.get(style,0)
                     data['changed_last_days'] = True if self.changed_last_days_settings[style] > data['last_changed_days_ago'] else False
                     data['diff_to_expected_margin'] = diff_to_expected_margin
@@ -1447,6 +1531,25 @@ class PricingLogic:
                     data['group_logic'] = group_logic
                     
                     data_for_pricing.append(data)
+        
+        # predaje za sezonu a ST pre vsetky riadky naraz
+        if data_for_pricing:
+            sold_items_season = self.sales.sold(
+                self.sales.style_ids([data['style'] for data in data_for_pricing]),
+                all_country_id,
+                [data['days_from_season_start'] for data in data_for_pricing]
+            ).tolist()
+            ST_data = self._get_ST_data(data_for_pricing)
+        
+        for i, data in enumerate(data_for_pricing):
+            data['sold_items_season'] = sold_items_season[i]
+            
+            # sell_power, max discount ST
+            data.update(self._get_sell_power_and_max_discount_ST(
+                data['country_code'], data['brand'], data['category'], data['item_category'], data['item_group0'],
+                ST_data = {column: values[i] for column, values in ST_data.items()}
+            ))
+            data['min_discount'], data['max_discount'] = self._get_min_max_discount(data)
   
         self.data_for_pricing = data_for_pricing
     
@@ -1485,7 +1588,8 @@ class PricingLogic:
         sample_range = 'EXPORT!A2:ZZZ1000000'
         gapi = GoogleSheetsApi(
             path_token = self.settings.gs_path_token,
-            path_client_secret = self.settings.gs_path_client_secret
+            path_client_secret = self.settings.gs_path_client_secret,
+            snapshot_dir = self.settings.gs_snapshot_dir
         ) 
         logger.info(f'Updating data shape {df_export_gs.shape}...')
         logger.info(f'Deleting everything from {self.settings.gs_spreadsheet_id}...')
@@ -1508,7 +1612,7 @@ class PricingLogic:
         #### !!!!
         
         # cena v lokalnej mene
-        df_recommendations['recom_price_local_currency'] = df_recommendations.apply(lambda row: row['recom_price'] * self.conversion_rates[row['currency']], axis=1)
+        df_recommendations['recom_price_local_currency'] = self.fx.convert(df_recommendations['recom_price'], 'EUR', df_recommendations['currency'])
         
         # Kickz round to 0.95
         df_recommendations['recom_price_local_currency'] = np.floor(df_recommendations['recom_price_local_currency']) + 0.95
@@ -1567,8 +1671,16 @@ class PricingLogic:
         
     @timeit
     def _insert_into_s3(self):
+        # kopia pre dataset, store() prevadza object stlpce na str in place
+        df_recommendations = self.df_recommendations.copy()
         S3RcmndHistory.store(self.df_recommendations)
         
+        # chyba v datasete nesmie zastavit beh, denny subor je uz ulozeny
+        try:
+            RcmndHistoryDataset().write(df_recommendations)
+        except Exception:
+            logger.exception('Rcmnd history dataset was not updated!')
+        
     @timeit
     def upload_dashboard_data(self):
         df_dashboard = self.df_recommendations
@@ -1581,7 +1693,7 @@ class PricingLogic:
              'category','item_category','item_group0','item_group1','item_group2'
         ]].round(2)
         
-        df_orders  = get_orders(from_date=df_dashboard['date'].iloc[0])
+        df_orders  = OrdersStore.load(from_date=df_dashboard['date'].iloc[0])
         df_orders['date'] = pd.to_datetime(df_orders['date']).dt.date
         
         df_dashboard = df_dashboard.merge(
@@ -1612,6 +1724,13 @@ class PricingLogic:
             compression = 'gzip', 
             index = False
         )
+        # znovu ulozeny den uz skompaktovaneho mesiaca sa musi citat z denneho suboru
+        recommendations_backup_archive().invalidate(pd.to_datetime(df_backup['date']).dt.date.unique())
+        
+        try:
+            RcmndHistoryDataset('backup/rcmnd_history').write(df_recommendations)
+        except Exception:
+            logger.exception('Backup rcmnd history dataset was not updated!')
         
     @timeit   
     def run(self, insert_into_production=False, insert_into_s3=False):
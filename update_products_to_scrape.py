@@ -5,7 +5,7 @@ import datetime as dt
 from libs.google_sheets import GoogleSheetsApi
 from client_based_code.kickz_code import (
     S3ProductsToScore,
-    get_orders
+    OrdersStore
 )
 
 logger = logging.getLogger(__name__)
@@ -21,7 +21,8 @@ class UpdateProductsToScrape:
         """
         return GoogleSheetsApi(
             path_token = self.settings.gs_path_token,
-            path_client_secret = self.settings.gs_path_client_secret
+            path_client_secret = self.settings.gs_path_client_secret,
+            snapshot_dir = self.settings.gs_snapshot_dir
         )
     
     def _load_products_to_score(self):
@@ -40,7 +41,7 @@ class UpdateProductsToScrape:
         to_date = dt.date.today()
         from_date = to_date - dt.timedelta(days=history_days)
         
-        return get_orders(from_date=from_date, to_date=to_date)
+        return OrdersStore.load(from_date=from_date, to_date=to_date)
     
     def _update_sheet(self, df, sample_spreadsheet_id, sample_range):
         logger.info(f'Updating data shape {df.shape}...')